@@ -29,6 +29,28 @@ DEBUG = os.environ.get("DMARC_VIEWER_DEBUG", False)
 
 GEO_LITE2_CITY_DB = os.path.join(BASE_DIR, "GeoLite2-City.mmdb")
 
+# Maxmind GeoLite2 db used by the report parser. The parser only looks up
+# countries, so you can also use the smaller GeoLite2 Country db, e.g.:
+# GEO_LITE2_DB = os.path.join(BASE_DIR, "GeoLite2-Country.mmdb")
+GEO_LITE2_DB = GEO_LITE2_CITY_DB
+
+# Mode to open the GeoLite2 db with, one of "mmap" (memory-mapped, shared by
+# parallel parser processes), "file", "memory" or "auto"
+# See `website.geoip` for details
+GEO_LITE2_DB_MODE = "mmap"
+
+# Hash algorithm used by the report parser to recognize already stored
+# reports, "md5" or "blake2b" (faster, requires 'pyblake2' on Python 2).
+# Convert the hashes of stored reports with `python manage.py rehash` when
+# changing it. See `website.hashing` for details
+REPORT_HASH_ALGORITHM = "md5"
+
+# Number of months to keep stored reports for, e.g. 24, or None to keep all
+# reports. Reports of older months are deleted with
+# `python manage.py retention` (e.g. run monthly from cron). See
+# `website.retention` for details
+REPORT_RETENTION_MONTHS = None
+
 # Whitelist host/domain names to prevent HTTP Host header attacks
 # https://docs.djangoproject.com/en/1.11/ref/settings/#std:setting-ALLOWED_HOSTS
 # NOTE: Override the setting here if you want to whitelist multiple names,
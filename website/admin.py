@@ -18,8 +18,9 @@
 """
 from django.contrib import admin
 from super_inlines.admin import SuperInlineModelAdmin, SuperModelAdmin
-from website.models import (Report, Reporter, ReportError, Record,
-    PolicyOverrideReason, AuthResultDKIM, AuthResultSPF, View, FilterSet,
+from website.models import (Domain, Report, Reporter, ReportError, Record,
+    PolicyOverrideReason, AuthResultDKIM, AuthResultSPF, FailedReport,
+    View, FilterSet,
     ReportType, DateRange, ReportSender, ReportReceiverDomain,
     SourceIP, RawDkimDomain, RawDkimResult, RawSpfDomain, RawSpfResult,
     AlignedDkimResult, AlignedSpfResult, Disposition, MultipleDkim)
@@ -33,16 +34,19 @@ class PolicyOverrideReasonInline(admin.StackedInline):
 class AuthResultSPFInline(SuperInlineModelAdmin, admin.StackedInline):
     model = AuthResultSPF
     extra = 0
+    raw_id_fields = ("domain",)
 
 
 class AuthResultDKIMInline(SuperInlineModelAdmin, admin.StackedInline):
     model = AuthResultDKIM
     extra = 0
+    raw_id_fields = ("domain",)
 
 
 class RecordInline(SuperInlineModelAdmin, admin.StackedInline):
     model = Record
     extra = 0
+    raw_id_fields = ("envelope_to", "envelope_from", "header_from")
     inlines = (PolicyOverrideReasonInline, AuthResultSPFInline,
             AuthResultDKIMInline,)
 
@@ -52,6 +56,11 @@ class ReportErrorInline(SuperInlineModelAdmin, admin.StackedInline):
     extra = 0
 
 
+class DomainAdmin(admin.ModelAdmin):
+    list_display = ("name",)
+    search_fields = ("name",)
+
+
 class ReporterAdmin(SuperModelAdmin):
     model = Reporter
     list_display = ("org_name", "email", "extra_contact_info")
@@ -60,12 +69,23 @@ class ReporterAdmin(SuperModelAdmin):
 class ReportAdmin(SuperModelAdmin):
     list_display = ("report_id", "date_range_begin", "date_range_end",
             "report_type", "date_created")
+    raw_id_fields = ("domain",)
     inlines = (ReportErrorInline, RecordInline,)
 
 
+class RecordAdmin(admin.ModelAdmin):
+    raw_id_fields = ("report", "envelope_to", "envelope_from", "header_from")
+
+
+class FailedReportAdmin(admin.ModelAdmin):
+    list_display = ("path", "report_type", "date_failed", "error")
+
+
 admin.site.register(Report, ReportAdmin)
 admin.site.register(Reporter, ReporterAdmin)
-admin.site.register(Record)
+admin.site.register(Domain, DomainAdmin)
+admin.site.register(Record, RecordAdmin)
+admin.site.register(FailedReport, FailedReportAdmin)
 
 
 class ReportSenderInline(SuperInlineModelAdmin, admin.StackedInline):
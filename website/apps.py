@@ -0,0 +1,166 @@
+"""
+<Program Name>
+    apps.py
+
+<Author>
+    Lukas Puehringer <luk.puehringer@gmail.com>
+
+<Started>
+    October, 2026
+
+<Copyright>
+    See LICENSE for licensing information.
+
+<Purpose>
+    Django application configuration for the DMARC viewer website.
+    See https://docs.djangoproject.com/en/1.11/ref/applications/
+
+    Besides the btree indexes defined in `website.models`, the filter form's
+    dynamic choices (see `website.views.choices_async`) query reporter e-mail
+    addresses and domain names with `[i]contains`, and DKIM and SPF filters
+    match the authentication results strings of record facts with
+    `contains` (see `website.models._auth_results_filter`), which btree
+    indexes can't serve. On PostgreSQL, trigram indexes (`pg_trgm`
+    extension) are created after each `migrate` for these columns. Django
+    1.11 model indexes don't support operator classes, hence the raw SQL.
+
+    If the db user may not create the `pg_trgm` extension, create it as
+    superuser (`CREATE EXTENSION pg_trgm;`) and run `migrate` again.
+
+    Source IP filters match record facts by network (see `website.networks`),
+    using the `inet` containment operator on PostgreSQL, which is served by
+    a GiST index (`inet_ops`) on the facts' source IPs, also created after
+    each `migrate`. On SQLite the function used by network lookups is
+    registered on each new db connection.
+
+    Parallel parser processes rely on unique constraints to not store the same
+    reporter twice (see `website.management.commands.parse`). The unique
+    constraint on reporters does not cover reporters without
+    `extra_contact_info` (NULL), hence a partial unique index for these is
+    created on PostgreSQL after each `migrate` too. If the reporters table
+    contains duplicates of such reporters, the index is skipped with a
+    warning.
+
+    Compiled analysis view filters are cached per view revision, which is
+    updated whenever a view, filter set or filter field is saved or deleted.
+
+"""
+import logging
+
+from django.apps import AppConfig
+from django.db import DatabaseError, connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_migrate, post_save
+
+from website.networks import register_sqlite_functions
+
+logger = logging.getLogger(__name__)
+
+# Index name, table and indexed expression of trigram indexes, the
+# expressions must match the SQL of Django's `[i]contains` lookups
+TRIGRAM_INDEXES = (
+    ("reporter_email_trgm_idx", "website_reporter",
+            "UPPER(\"email\"::text) gin_trgm_ops"),
+    ("domain_name_trgm_idx", "website_domain",
+            "(\"name\"::text) gin_trgm_ops"),
+    ("recordfact_dkim_results_trgm_idx", "website_recordfact",
+            "(\"dkim_results\"::text) gin_trgm_ops"),
+    ("recordfact_spf_results_trgm_idx", "website_recordfact",
+            "(\"spf_results\"::text) gin_trgm_ops"),
+)
+
+# Index name, table and indexed expression of GiST indexes for `inet`
+# containment queries, see `website.networks`
+NETWORK_INDEXES = (
+    ("recordfact_source_ip_gist_idx", "website_recordfact",
+            "\"source_ip\" inet_ops"),
+)
+
+# Index name, table, indexed columns and condition of partial unique indexes
+UNIQUE_INDEXES = (
+    ("reporter_no_contact_info_uniq", "website_reporter",
+            "\"org_name\", \"email\"", "\"extra_contact_info\" IS NULL"),
+)
+
+class WebsiteConfig(AppConfig):
+    name = "website"
+
+    def ready(self):
+        post_migrate.connect(create_network_indexes, sender=self)
+        post_migrate.connect(create_trigram_indexes, sender=self)
+        post_migrate.connect(create_unique_indexes, sender=self)
+        connection_created.connect(register_sqlite_functions)
+
+        # Update the revision of a view, whose compiled filters are cached
+        # (see `website.models.View.getPlan`), when it is edited
+        from website.models import (View, FilterSet, FilterSetFilterField,
+                ViewFilterField, update_view_revision)
+        for model in ([View, FilterSet] +
+                FilterSetFilterField.__subclasses__() +
+                ViewFilterField.__subclasses__()):
+            post_save.connect(update_view_revision, sender=model)
+            post_delete.connect(update_view_revision, sender=model)
+
+
+
+def create_network_indexes(sender, using="default", **kwargs):
+    """Create GiST indexes (see NETWORK_INDEXES) on PostgreSQL, if they don't
+    exist yet. """
+    connection = connections[using]
+
+    if connection.vendor != "postgresql":
+        return
+
+    with connection.cursor() as cursor:
+        for name, table, expression in NETWORK_INDEXES:
+            cursor.execute("CREATE INDEX IF NOT EXISTS {0} ON {1} USING gist"
+                    " ({2})".format(name, table, expression))
+
+
+
+def create_trigram_indexes(sender, using="default", **kwargs):
+    """Create trigram indexes (see TRIGRAM_INDEXES) on PostgreSQL, if they
+    don't exist yet. Logs a warning and skips them if the `pg_trgm` extension
+    can't be created. """
+    connection = connections[using]
+
+    if connection.vendor != "postgresql":
+        return
+
+    try:
+        with transaction.atomic(using=using):
+            with connection.cursor() as cursor:
+                cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    except DatabaseError as e:
+        logger.warning("Could not create 'pg_trgm' extension, skipping"
+                " trigram indexes: {}".format(e))
+        return
+
+    with connection.cursor() as cursor:
+        for name, table, expression in TRIGRAM_INDEXES:
+            cursor.execute("CREATE INDEX IF NOT EXISTS {0} ON {1} USING gin"
+                    " ({2})".format(name, table, expression))
+
+
+
+def create_unique_indexes(sender, using="default", **kwargs):
+    """Create partial unique indexes (see UNIQUE_INDEXES) on PostgreSQL, if
+    they don't exist yet. Logs a warning and skips an index if the table
+    contains duplicates. """
+    connection = connections[using]
+
+    if connection.vendor != "postgresql":
+        return
+
+    for name, table, columns, condition in UNIQUE_INDEXES:
+        try:
+            with transaction.atomic(using=using):
+                with connection.cursor() as cursor:
+                    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS {0} ON"
+                            " {1} ({2}) WHERE {3}".format(name, table,
+                            columns, condition))
+
+        except DatabaseError as e:
+            logger.warning("Could not create unique index '{0}': {1}"
+                    .format(name, e))
@@ -23,6 +23,11 @@
     This module also provides a helper function that converts the string values
     parsed from DMARC aggregate reports to the here defined numeric constants.
 
+    For frequent conversions, e.g. when parsing or displaying many records,
+    precomputed dictionaries are defined for each tuple at the end of this
+    module, i.e. `<TUPLE>_NUMERIC` maps lower case string values to numeric
+    values and `<TUPLE>_LABEL` maps numeric values to string values.
+
 """
 
 
@@ -34,6 +39,17 @@ def _string_to_numeric(choices, val):
             return choice[0]
     return None
 
+def _numeric_dict(choices):
+    """Takes a choices tuple and returns a dictionary that maps the lower case
+    string representations to the numeric representations. """
+    return {label.lower(): numeric for numeric, label in choices
+            if numeric is not None}
+
+def _label_dict(choices):
+    """Takes a choices tuple and returns a dictionary that maps the numeric
+    representations to the string representations. """
+    return dict(choices)
+
 INCOMING = 1
 OUTGOING = 2
 REPORT_TYPE = (
@@ -137,4 +153,26 @@ DATE_RANGE_TYPE_VARIABLE = 2
 DATE_RANGE_TYPE = (
     (DATE_RANGE_TYPE_FIXED, "from - to (absolute)"),
     (DATE_RANGE_TYPE_VARIABLE, "last x ... (dynamic)")
-    )
\ No newline at end of file
+    )
+
+# Precomputed lookup dictionaries (see module docstring)
+REPORT_TYPE_NUMERIC = _numeric_dict(REPORT_TYPE)
+REPORT_TYPE_LABEL = _label_dict(REPORT_TYPE)
+ALIGNMENT_MODE_NUMERIC = _numeric_dict(ALIGNMENT_MODE)
+ALIGNMENT_MODE_LABEL = _label_dict(ALIGNMENT_MODE)
+DISPOSITION_TYPE_NUMERIC = _numeric_dict(DISPOSITION_TYPE)
+DISPOSITION_TYPE_LABEL = _label_dict(DISPOSITION_TYPE)
+DMARC_RESULT_NUMERIC = _numeric_dict(DMARC_RESULT)
+DMARC_RESULT_LABEL = _label_dict(DMARC_RESULT)
+POLICY_REASON_TYPE_NUMERIC = _numeric_dict(POLICY_REASON_TYPE)
+POLICY_REASON_TYPE_LABEL = _label_dict(POLICY_REASON_TYPE)
+SPF_SCOPE_NUMERIC = _numeric_dict(SPF_SCOPE)
+SPF_SCOPE_LABEL = _label_dict(SPF_SCOPE)
+SPF_RESULT_NUMERIC = _numeric_dict(SPF_RESULT)
+SPF_RESULT_LABEL = _label_dict(SPF_RESULT)
+DKIM_RESULT_NUMERIC = _numeric_dict(DKIM_RESULT)
+DKIM_RESULT_LABEL = _label_dict(DKIM_RESULT)
+TIME_UNIT_NUMERIC = _numeric_dict(TIME_UNIT)
+TIME_UNIT_LABEL = _label_dict(TIME_UNIT)
+DATE_RANGE_TYPE_NUMERIC = _numeric_dict(DATE_RANGE_TYPE)
+DATE_RANGE_TYPE_LABEL = _label_dict(DATE_RANGE_TYPE)
@@ -26,8 +26,7 @@
 from django.utils.translation import gettext as _
 from django.forms import (ModelForm, ValidationError, ChoiceField,
         MultipleChoiceField, TypedMultipleChoiceField, CharField,
-        GenericIPAddressField, IntegerField, DateTimeField, TypedChoiceField,
-        BooleanField)
+        IntegerField, DateTimeField, TypedChoiceField, BooleanField)
 from django.forms.models import inlineformset_factory, modelform_factory
 from django.forms.widgets import RadioSelect, Textarea
 from django.urls import reverse
@@ -39,7 +38,7 @@ from website.models import (Report, Reporter, ReportError, Record,
         AlignedDkimResult, AlignedSpfResult, Disposition, MultipleDkim)
 from website.widgets import (ColorPickerWidget, MultiSelectWidget,
         DatePickerWidget)
-from website import choices
+from website import choices, networks
 
 
 
@@ -268,6 +267,9 @@ class FilterSetForm(ModelForm):
         # element, "class" identifies the corresponding model class (subclass
         # of `FilterSetFilterField`), and "type" defines the allowed type of
         # the form value, used for Django's auto sanitization/type coercion.
+        # Multiselect form fields that accept values other than the loaded
+        # options define a true "create" value, and optionally an "invalid"
+        # error message for values that can't be coerced to "type".
         self.multiselect_filter_fields = {
             "report_sender" : {
                 "load" : "reporter",
@@ -275,6 +277,15 @@ class FilterSetForm(ModelForm):
                 "class" : ReportSender,
                 "type" : unicode
             },
+            "source_ip" : {
+                "load" : "source_ip",
+                "create" : True,
+                "label" : "Mail Sender IP(s) or Network(s)",
+                "class" : SourceIP,
+                "type" : networks.normalize,
+                "invalid" : _("'%(value)s' is not a valid IP address or"
+                        " network.")
+            },
             "report_receiver_domain" : {
                 "load" : "reportee",
                 "label" : "Reportee(s)",
@@ -329,15 +340,21 @@ class FilterSetForm(ModelForm):
         # are only relevant for multiselect elements that load their options
         # dynamically.
         for field_name, field_dict in self.multiselect_filter_fields.iteritems():
+            error_messages = {}
+            if field_dict.get("invalid"):
+                error_messages["invalid_choice"] = field_dict["invalid"]
+
             self.fields[field_name] = AsyncTypedMultipleChoiceField(
                     coerce=field_dict.get("type"),
+                    error_messages=error_messages,
                     required=False,
                     label=field_dict.get("label"),
                     choices=field_dict.get("choices", ()),
                     widget=MultiSelectWidget(
                             **{
                                 "load": field_dict.get("load", ""),
-                                "action": reverse("choices_async")
+                                "action": reverse("choices_async"),
+                                "create": field_dict.get("create", False)
                             }))
 
             # If the corresponding model objects already exists (i.e. on edit)
@@ -357,24 +374,15 @@ class FilterSetForm(ModelForm):
 
 
         # Define additional non-multiselect filter set filter field form fields
-        # Currently, there can at most be one `SourceIP` and one `MultipleDkim`
-        # object on a filter set. See `models.FilterSetFilterField`'s docstring
-        # for more info about why these filters have their own class and aren't
-        # attributes of a `FilterSet` object.
-        self.fields["source_ip"] = GenericIPAddressField(required=False,
-                label="Mail Sender IP")
+        # Currently, there can at most be one `MultipleDkim` object on a filter
+        # set. See `models.FilterSetFilterField`'s docstring for more info
+        # about why these filters have their own class and aren't attributes
+        # of a `FilterSet` object.
         self.fields["multiple_dkim"] = BooleanField(required=False,
                 label="Multiple DKIM only")
 
         # Fill fields with existing data if any
         if self.instance.id:
-            source_ip_initial = SourceIP.objects.filter(
-                    foreign_key=self.instance.id).values_list(
-                    "value", flat=True)
-
-            if len(source_ip_initial):
-                self.fields["source_ip"].initial = source_ip_initial[0]
-
             multiple_dkim_initial = MultipleDkim.objects.filter(
                     foreign_key=self.instance.id).values_list(
                     "value", flat=True)
@@ -421,25 +429,6 @@ class FilterSetForm(ModelForm):
                         ).delete()
 
 
-        # Create, update or delete corresponding `SourceIP` object
-        # Currently, there can at most be one `SourceIP` object on a filter
-        # set. See `models.FilterSetFilterField`'s docstring for more info.
-        source_ip = SourceIP.objects.filter(
-                foreign_key=self.instance.id).first()
-        source_ip_value = self.cleaned_data["source_ip"]
-
-        if source_ip and not source_ip_value:
-            source_ip.delete()
-
-        if not source_ip and source_ip_value:
-            source_ip = SourceIP(
-                    foreign_key=self.instance, value=source_ip_value)
-            source_ip.save()
-
-        if source_ip and source_ip_value:
-            source_ip.value = source_ip_value
-            source_ip.save()
-
         # Delete or create corresponding `MultipleDkim` object
         # There is no need to update because we only keep true valued
         # instances. There can at most be one `MultipleDkim` object on a filter
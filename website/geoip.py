@@ -0,0 +1,140 @@
+"""
+<Program Name>
+    geoip.py
+
+<Author>
+    Lukas Puehringer <luk.puehringer@gmail.com>
+
+<Started>
+    October, 2026
+
+<Copyright>
+    See LICENSE for licensing information.
+
+<Purpose>
+    Cached lookup of ISO 3166 alpha-2 country codes for IP addresses in a
+    Maxmind GeoLite2 database, used by the report parser (see
+    `website.management.commands.parse`).
+
+    The same sending IP addresses show up in thousands of reports, hence the
+    most recently looked up country codes are kept in a bounded LRU cache.
+    Optionally, IP addresses are cached per network prefix (e.g. /24 for IPv4
+    and /48 for IPv6), which yields more cache hits at the cost of accuracy
+    for networks that are split across countries.
+
+    Only the country code is read from the database record, instead of
+    creating a complete `geoip2` City model for each address. This works with
+    GeoLite2 City and Country databases, see `settings.GEO_LITE2_DB`.
+
+    The database is only opened on first lookup and, by default, memory-mapped
+    (see `settings.GEO_LITE2_DB_MODE`), so that the pages of the database file
+    are shared between parallel parser processes via the OS page cache.
+
+"""
+import socket
+import binascii
+import collections
+
+import maxminddb
+
+
+DEFAULT_CACHE_SIZE = 100000
+
+# Modes to open the database with, see `maxminddb.open_database`. "mmap" uses
+# the faster C extension if it is available.
+MODES = {
+    "auto": maxminddb.MODE_AUTO,
+    "mmap": (maxminddb.MODE_MMAP_EXT
+            if getattr(maxminddb.extension, "Reader", None)
+            else maxminddb.MODE_MMAP),
+    "file": maxminddb.MODE_FILE,
+    "memory": maxminddb.MODE_MEMORY
+}
+
+# Network prefix lengths used as cache keys with `prefix=True`
+PREFIX_V4 = 24
+PREFIX_V6 = 48
+
+
+
+class CountryLookup(object):
+    """Looks up ISO country codes of IP addresses in a GeoLite2 db, caching
+    up to `cache_size` results (0 disables the cache), and counts cache hits
+    and misses. """
+
+    def __init__(self, path, mode="mmap", cache_size=DEFAULT_CACHE_SIZE,
+            prefix=False):
+        """Takes the path to a GeoLite2 City or Country db, the mode to open
+        it with (see `MODES`), the maximum number of cached results and
+        whether to cache results per network prefix instead of per IP
+        address. The db is opened on first lookup. """
+        self.path = path
+        self.mode = mode
+        self.cache_size = cache_size
+        self.prefix = prefix
+        self.cache = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._reader = None
+
+
+    @property
+    def reader(self):
+        """Return `maxminddb` reader for the db, opening it if necessary. """
+        if self._reader is None:
+            self._reader = maxminddb.open_database(self.path,
+                    MODES[self.mode])
+
+        return self._reader
+
+
+    def country_iso_code(self, ip_address):
+        """Return ISO country code for passed IP address, or None if the
+        address is not in the database. Raises `ValueError` or
+        `socket.error` for invalid IP addresses. """
+        key = self._key(ip_address)
+
+        try:
+            # Re-insert below to mark as most recently used
+            iso_code = self.cache.pop(key)
+            self.hits += 1
+
+        except KeyError:
+            iso_code = self._lookup(ip_address)
+            self.misses += 1
+
+            if not self.cache_size:
+                return iso_code
+
+            # Evict least recently used result
+            if len(self.cache) >= self.cache_size:
+                self.cache.popitem(last=False)
+
+        self.cache[key] = iso_code
+        return iso_code
+
+
+    def _lookup(self, ip_address):
+        """Return ISO country code for passed IP address from db. """
+        record = self.reader.get(ip_address)
+        if not record:
+            return None
+
+        return record.get("country", {}).get("iso_code")
+
+
+    def _key(self, ip_address):
+        """Return cache key for passed IP address, i.e. the address itself or
+        its network prefix. """
+        if not self.prefix:
+            return ip_address
+
+        if ":" in ip_address:
+            family, prefix_len = socket.AF_INET6, PREFIX_V6
+
+        else:
+            family, prefix_len = socket.AF_INET, PREFIX_V4
+
+        packed = socket.inet_pton(family, ip_address)
+        host_bits = len(packed) * 8 - prefix_len
+        return family, int(binascii.hexlify(packed), 16) >> host_bits
@@ -0,0 +1,71 @@
+"""
+<Program Name>
+    hashing.py
+
+<Author>
+    Lukas Puehringer <luk.puehringer@gmail.com>
+
+<Started>
+    October, 2026
+
+<Copyright>
+    See LICENSE for licensing information.
+
+<Purpose>
+    Hash functions for report files, used by the report parser to detect
+    already stored reports (see `website.management.commands.parse`).
+
+    Besides MD5, BLAKE2b is supported, which is faster on 64-bit platforms. On
+    Python 2 it requires the optional `pyblake2` package. BLAKE2b digests are
+    truncated to 16 bytes, so that they fit the `Report.report_hash` column
+    like MD5 digests.
+
+    The algorithm is configured with `settings.REPORT_HASH_ALGORITHM`. Hashes
+    of stored reports can be converted to another algorithm with
+    `python manage.py rehash` (given the original report files).
+
+"""
+import hashlib
+import functools
+
+try:
+    from hashlib import blake2b
+
+except ImportError:
+    try:
+        from pyblake2 import blake2b
+
+    except ImportError:
+        blake2b = None
+
+
+# Number of bytes read at once when hashing report files
+CHUNK_SIZE = 64 * 1024
+
+# Available hash algorithms
+ALGORITHMS = {
+    "md5": hashlib.md5
+}
+
+if blake2b:
+    ALGORITHMS["blake2b"] = functools.partial(blake2b, digest_size=16)
+
+
+
+def new(algorithm):
+    """Return new hash object for passed algorithm name. Raises `ValueError`
+    if the algorithm is not available. """
+    try:
+        return ALGORITHMS[algorithm]()
+
+    except KeyError:
+        raise ValueError("Hash algorithm '{0}' is not available, use one of"
+                " {1} (BLAKE2b requires 'pyblake2' on Python 2)".format(
+                algorithm, ", ".join(sorted(ALGORITHMS))))
+
+
+
+def chunks(file):
+    """Return iterator over the contents of passed file object in chunks of
+    CHUNK_SIZE bytes. """
+    return iter(functools.partial(file.read, CHUNK_SIZE), b"")
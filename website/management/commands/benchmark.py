@@ -0,0 +1,415 @@
+"""
+<Program Name>
+    benchmark.py
+
+<Author>
+    Lukas Puehringer <luk.puehringer@gmail.com>
+
+<Started>
+    October, 2026
+
+<Copyright>
+    See LICENSE for licensing information.
+
+<Purpose>
+    Django management command to measure the throughput of the report parser
+    (see `website.management.commands.parse`), e.g. to detect performance
+    regressions before a release or to size hardware for a given report
+    volume.
+
+    The command generates synthetic DMARC aggregate reports, as defined in
+    https://tools.ietf.org/html/rfc7489#appendix-C, with configurable numbers
+    of reports, records per report, DKIM and SPF authentication results per
+    record, distinct source IP addresses and reporters, optionally in the
+    anonymized format used for University of Vienna's incoming reports
+    (`--univie`). The same seed generates the same reports.
+
+    The reports are then parsed into a temporary test database, created with
+    the settings of the configured database (see Django's `TEST` database
+    settings, SQLite test databases are kept in memory), which is destroyed
+    afterwards. The parser uses a dummy cache meanwhile, so that it doesn't
+    replace cached data of the configured database. The command reports
+    the db backend, files and records parsed per second, db queries per
+    report and the peak memory usage (RSS) of the process. Note that counting
+    queries adds a small overhead.
+
+    The parser stores records with bulk inserts only on db backends that
+    return the ids of bulk inserted objects, i.e. PostgreSQL. On other
+    backends, e.g. SQLite, it saves records one by one (see
+    `parse._bulk_create_records`), which the command points out, because
+    the numbers then don't measure the bulk insert path. Run the benchmark
+    with the production db backend to get representative numbers.
+
+<Usage>
+    ```
+    python manage.py benchmark \
+      [--reports <n>] [--records <n>] [--dkim <n>] [--spf <n>] [--ips <n>] \
+      [--reporters <n>] [--univie] [--type (in|out)] [--stream] \
+      [--batch-size <n>] [--seed <n>] [--output-dir <dir>] [--json <path>]
+    ```
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import socket
+import struct
+import logging
+import resource
+import tempfile
+import datetime
+import xml.etree.ElementTree
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from website.models import Report, Record
+from website.management.commands import parse
+
+logger = logging.getLogger(__name__)
+
+# Values to pick from randomly for generated reports
+DISPOSITIONS = ("none", "quarantine", "reject")
+DMARC_RESULTS = ("pass", "fail")
+DKIM_RESULTS = ("none", "pass", "fail", "policy", "neutral", "temperror",
+        "permerror")
+SPF_RESULTS = ("none", "neutral", "pass", "fail", "softfail", "temperror",
+        "permerror")
+REASON_TYPES = ("forwarded", "sampled_out", "trusted_forwarder",
+        "mailing_list", "local_policy", "other")
+COUNTRIES = ("AT", "DE", "US", "CN", "RU", "BR", "FR", "GB")
+
+# Cache settings while parsing into the test db
+DUMMY_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.dummy.DummyCache"
+    }
+}
+
+# Share of generated source IP addresses that are IPv6 addresses
+IPV6_SHARE = 0.1
+
+# First day of the generated reports' date ranges, one report per day and
+# reporter
+START_DATE = datetime.datetime(2026, 1, 1)
+
+
+
+class Command(BaseCommand):
+    help = ("Measure report parser throughput using synthetic DMARC aggregate"
+            " reports and a temporary test db")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reports", dest="reports", default=100,
+                type=int, help="Number of generated reports (default 100)")
+
+        parser.add_argument("--records", dest="records", default=100,
+                type=int, help="Number of records per report (default 100)")
+
+        parser.add_argument("--dkim", dest="dkim", default=2, type=int,
+                help=("Maximum number of DKIM authentication results per"
+                " record (default 2)"))
+
+        parser.add_argument("--spf", dest="spf", default=1, type=int,
+                help=("Maximum number of SPF authentication results per"
+                " record, at least one (default 1)"))
+
+        parser.add_argument("--ips", dest="ips", default=1000, type=int,
+                help="Number of distinct source IP addresses (default 1000)")
+
+        parser.add_argument("--reporters", dest="reporters", default=10,
+                type=int, help="Number of distinct reporters (default 10)")
+
+        parser.add_argument("--univie", dest="univie", default=False,
+                action="store_true", help=("Generate and parse special"
+                " anonymized format used for University of Vienna's incoming"
+                " reports"))
+
+        parser.add_argument("--type", action="store", dest="type",
+                default="in", choices=("in", "out"), help=("Report type to"
+                " parse the reports as (default in)"))
+
+        parser.add_argument("--stream", dest="stream", default=False,
+                action="store_true", help="Parse reports with --stream")
+
+        parser.add_argument("--batch-size", dest="batch_size",
+                default=parse.BATCH_SIZE, type=int, help=("Batch size to parse"
+                " reports with (default {})".format(parse.BATCH_SIZE)))
+
+        parser.add_argument("--seed", dest="seed", default=0, type=int,
+                help="Seed for the report generator (default 0)")
+
+        parser.add_argument("--output-dir", dest="output_dir", default=None,
+                help=("Keep generated reports in this directory, instead of a"
+                " temporary directory"))
+
+        parser.add_argument("--json", dest="json", default=None,
+                help="Also write results as JSON object to this file")
+
+    def handle(self, *args, **options):
+        for option in ("reports", "records", "ips", "reporters", "spf"):
+            if options[option] < 1:
+                raise CommandError("Pass a positive --{}.".format(option))
+
+        if options["dkim"] < 0:
+            raise CommandError("Pass a non-negative --dkim.")
+
+        report_dir = options["output_dir"] or tempfile.mkdtemp(
+                prefix="dmarc-benchmark-")
+        if not os.path.isdir(report_dir):
+            os.makedirs(report_dir)
+
+        try:
+            self.stdout.write("Generating {reports} reports with {records}"
+                    " records each in '{dir}'".format(dir=report_dir,
+                    **options))
+            generate_reports(report_dir, options["reports"],
+                    options["records"], options["dkim"], options["spf"],
+                    options["ips"], options["reporters"], options["univie"],
+                    options["seed"])
+
+            results = self.benchmark(report_dir, options)
+
+        finally:
+            if not options["output_dir"]:
+                shutil.rmtree(report_dir)
+
+        self.stdout.write("Parsed {files} files ({records} records) into a"
+                " {database} db in {seconds:.2f} s\n"
+                "  {files_per_second:.1f} files/s\n"
+                "  {records_per_second:.1f} records/s\n"
+                "  {queries_per_report:.1f} queries per report\n"
+                "  {peak_rss_mb:.1f} MB peak RSS".format(**results))
+
+        if not results["bulk_insert_records"]:
+            self.stdout.write("Note: The {} db backend can't return ids from"
+                    " bulk inserts, so records were saved one by one, with"
+                    " one INSERT each, instead of with bulk inserts. Run the"
+                    " benchmark with PostgreSQL to measure the bulk insert"
+                    " path.".format(results["database"]))
+
+        if options["json"]:
+            with open(options["json"], "w") as json_file:
+                json.dump(dict(results, options={key: options[key] for key in
+                        ("reports", "records", "dkim", "spf", "ips",
+                        "reporters", "univie", "type", "stream", "batch_size",
+                        "seed")}), json_file, indent=2, sort_keys=True)
+
+    def benchmark(self, report_dir, options):
+        """Parse the reports in passed directory into a temporary test db
+        and return a dict of measurements. """
+
+        # Per-file parser messages would dominate the output
+        parse_logger = logging.getLogger("parse")
+        parse_log_level = parse_logger.level
+        if options["verbosity"] < 2:
+            parse_logger.setLevel(logging.ERROR)
+
+        old_db_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True,
+                serialize=False)
+
+        # Count queries without keeping them (see `_QueryCounter`)
+        query_counter = _QueryCounter()
+        queries_log = connection.queries_log
+        force_debug_cursor = connection.force_debug_cursor
+
+        try:
+            connection.queries_log = query_counter
+            connection.force_debug_cursor = True
+
+            # The parser caches data of the test db (see
+            # `Report.cacheOverviewSummaries`), which must not replace the
+            # data of the configured db in the shared cache
+            with override_settings(CACHES=DUMMY_CACHES):
+                start = time.time()
+                call_command("parse", report_dir, type=options["type"],
+                        univie=options["univie"], stream=options["stream"],
+                        batch_size=options["batch_size"],
+                        verbosity=options["verbosity"])
+                seconds = time.time() - start
+            query_cnt = query_counter.count
+
+            report_cnt = Report.objects.count()
+            record_cnt = Record.objects.count()
+
+        finally:
+            connection.force_debug_cursor = force_debug_cursor
+            connection.queries_log = queries_log
+            connection.creation.destroy_test_db(old_db_name, verbosity=0)
+            parse_logger.setLevel(parse_log_level)
+
+        if report_cnt != options["reports"]:
+            logger.warning("Only {0} of {1} reports were stored".format(
+                    report_cnt, options["reports"]))
+
+        # `ru_maxrss` is in kilobytes on Linux, but in bytes on macOS
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform != "darwin":
+            peak_rss *= 1024
+
+        return {
+            "database": connection.vendor,
+            # Records are saved one by one otherwise (see
+            # `parse._bulk_create_records`)
+            "bulk_insert_records":
+                    connection.features.can_return_ids_from_bulk_insert,
+            "files": options["reports"],
+            "records": record_cnt,
+            "seconds": seconds,
+            "files_per_second": options["reports"] / seconds,
+            "records_per_second": record_cnt / seconds,
+            "queries": query_cnt,
+            "queries_per_report": float(query_cnt) / options["reports"],
+            "peak_rss_mb": peak_rss / 1024.0 ** 2
+        }
+
+
+
+class _QueryCounter(object):
+    """Replacement for a db connection's `queries_log`, which counts logged
+    queries instead of storing them. """
+
+    def __init__(self):
+        self.count = 0
+
+    def append(self, query):
+        self.count += 1
+
+    def clear(self):
+        pass
+
+    def __len__(self):
+        return 0
+
+    def __iter__(self):
+        return iter(())
+
+
+
+def generate_reports(report_dir, report_cnt, record_cnt, max_dkim, max_spf,
+        ip_cnt, reporter_cnt, univie, seed):
+    """Write passed number of synthetic DMARC aggregate reports to passed
+    directory. Reports are spread over `reporter_cnt` reporters, one per day
+    and reporter, and use source IP addresses picked from `ip_cnt` random
+    addresses. Each record has between 0 and `max_dkim` DKIM and between 1
+    and `max_spf` SPF authentication results. If `univie` is True, source
+    IP addresses are anonymized and annotated with a country code. """
+    rng = random.Random(seed)
+    ips = [_random_ip(rng) for _ in range(ip_cnt)]
+
+    for report_idx in range(report_cnt):
+        reporter_idx = report_idx % reporter_cnt
+        begin = START_DATE + datetime.timedelta(
+                days=report_idx // reporter_cnt)
+
+        xml_root = generate_report(rng, report_idx, reporter_idx, begin,
+                record_cnt, max_dkim, max_spf, ips, univie)
+
+        xml.etree.ElementTree.ElementTree(xml_root).write(os.path.join(
+                report_dir, "report-{:06d}.xml".format(report_idx)),
+                encoding="UTF-8", xml_declaration=True)
+
+
+
+def generate_report(rng, report_idx, reporter_idx, begin, record_cnt,
+        max_dkim, max_spf, ips, univie):
+    """Return XML root element of a synthetic DMARC aggregate report, using
+    passed random number generator (see `generate_reports`). """
+    SubElement = xml.etree.ElementTree.SubElement
+
+    xml_root = xml.etree.ElementTree.Element("feedback")
+    SubElement(xml_root, "version").text = "1.0"
+
+    reporter_domain = "reporter{}.example.com".format(reporter_idx)
+    node_metadata = SubElement(xml_root, "report_metadata")
+    SubElement(node_metadata, "org_name").text = reporter_domain
+    SubElement(node_metadata, "email").text = "noreply-dmarc@{}".format(
+            reporter_domain)
+    if reporter_idx % 2:
+        SubElement(node_metadata, "extra_contact_info").text = (
+                "https://{}/dmarc".format(reporter_domain))
+    SubElement(node_metadata, "report_id").text = "{0}.{1}".format(
+            reporter_idx, report_idx)
+    node_date_range = SubElement(node_metadata, "date_range")
+    SubElement(node_date_range, "begin").text = str(_timestamp(begin))
+    SubElement(node_date_range, "end").text = str(_timestamp(begin +
+            datetime.timedelta(days=1)) - 1)
+    if rng.random() < 0.05:
+        SubElement(node_metadata, "error").text = "Report truncated"
+
+    node_policy_published = SubElement(xml_root, "policy_published")
+    SubElement(node_policy_published, "domain").text = "example.com"
+    SubElement(node_policy_published, "adkim").text = rng.choice("rs")
+    SubElement(node_policy_published, "aspf").text = rng.choice("rs")
+    SubElement(node_policy_published, "p").text = rng.choice(DISPOSITIONS)
+    SubElement(node_policy_published, "sp").text = rng.choice(DISPOSITIONS)
+    SubElement(node_policy_published, "pct").text = "100"
+
+    for _ in range(record_cnt):
+        node_record = SubElement(xml_root, "record")
+        node_row = SubElement(node_record, "row")
+        node_source_ip = SubElement(node_row, "source_ip")
+        if univie:
+            node_source_ip.text = "anonymized"
+            node_source_ip.set("geoip", rng.choice(COUNTRIES))
+        else:
+            node_source_ip.text = rng.choice(ips)
+        SubElement(node_row, "count").text = str(rng.randint(1, 1000))
+
+        node_policy_evaluated = SubElement(node_row, "policy_evaluated")
+        SubElement(node_policy_evaluated, "disposition").text = rng.choice(
+                DISPOSITIONS)
+        SubElement(node_policy_evaluated, "dkim").text = rng.choice(
+                DMARC_RESULTS)
+        SubElement(node_policy_evaluated, "spf").text = rng.choice(
+                DMARC_RESULTS)
+        if rng.random() < 0.1:
+            node_reason = SubElement(node_policy_evaluated, "reason")
+            SubElement(node_reason, "type").text = rng.choice(REASON_TYPES)
+            SubElement(node_reason, "comment").text = "Synthetic reason"
+
+        node_identifiers = SubElement(node_record, "identifiers")
+        SubElement(node_identifiers, "envelope_to").text = "example.com"
+        SubElement(node_identifiers, "header_from").text = "example.com"
+
+        node_auth_results = SubElement(node_record, "auth_results")
+        for dkim_idx in range(rng.randint(0, max_dkim)):
+            node_dkim = SubElement(node_auth_results, "dkim")
+            SubElement(node_dkim, "domain").text = "d{}.example.com".format(
+                    dkim_idx)
+            SubElement(node_dkim, "selector").text = "selector{}".format(
+                    dkim_idx)
+            SubElement(node_dkim, "result").text = rng.choice(DKIM_RESULTS)
+
+        for spf_idx in range(rng.randint(1, max_spf)):
+            node_spf = SubElement(node_auth_results, "spf")
+            SubElement(node_spf, "domain").text = "example.com"
+            SubElement(node_spf, "scope").text = rng.choice(
+                    ("mfrom", "helo"))
+            SubElement(node_spf, "result").text = rng.choice(SPF_RESULTS)
+
+    return xml_root
+
+
+
+def _random_ip(rng):
+    """Return random IPv4 or (with IPV6_SHARE probability) IPv6 address. """
+    if rng.random() < IPV6_SHARE:
+        # Global unicast addresses (2000::/3)
+        return socket.inet_ntop(socket.AF_INET6, struct.pack("!QQ",
+                rng.getrandbits(61) | 1 << 61, rng.getrandbits(64)))
+
+    return socket.inet_ntoa(struct.pack("!I", rng.randint(0x01000000,
+            0xdfffffff)))
+
+
+
+def _timestamp(date):
+    """Return UNIX timestamp of passed naive UTC datetime. """
+    return int((date - datetime.datetime(1970, 1, 1)).total_seconds())
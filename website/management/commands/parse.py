@@ -31,16 +31,92 @@
     To better visualize the reports you have to specify the report type when
     using this parser. Default is incoming reports (in).
 
-    Maxmind GeoLite2 City db is used to retrieve geo information for IP
-    addresses.
+    Maxmind GeoLite2 City (or Country) db is used to retrieve geo information
+    for IP addresses. Lookups are cached (see `website.geoip`), cache hits
+    and misses are logged at the end of a run.
 
     The parser generates and stores file hashes of the reports to skip reports
-    that are already in the database.
+    that are already in the database. Each report is read once, in chunks, and
+    hashed (see `settings.REPORT_HASH_ALGORITHM`) before its XML is parsed.
+    The hashes of all stored reports and the
+    ids of all stored reporters are loaded once at the beginning of a run, so
+    that already stored reports are skipped before parsing their XML and
+    known reporters are re-used without querying the database. Use
+    `--no-prescan` to query the database instead, e.g. to parse a few reports
+    into a large database.
+
+    The size and modification time of files read without errors are stored
+    too, in batches (see `website.models.ParsedFile`), so that unchanged files
+    are skipped without even reading them when a directory is parsed again.
+    Use `--rescan` to read all files.
+
+    The records of a report and their related objects are first created in
+    memory and then stored with one bulk insert per table (in batches of
+    `--batch-size` objects), instead of one INSERT per object.
+
+    Each report is stored in a single transaction. If a report cannot be
+    parsed or stored, nothing of it is kept in the database and the file is
+    added to a failure ledger (see `website.models.FailedReport`). Use
+    `--retry-failed` to parse the files of the ledger again.
+
+    Use `--workers <n>` to parse report files in <n> parallel processes. Each
+    process uses its own database connection and GeoIP reader. Unique
+    constraints on report hashes, reporters and domain names ensure that
+    concurrently parsed duplicates are not stored twice (see
+    `_create_reporter` and `_create_domains`). Parallel parsing requires
+    PostgreSQL.
+
+    Use `--stream` for very large reports. Reports are then parsed
+    incrementally and records are stored in batches while reading, hashing
+    the file in the same pass. Memory usage thus stays bounded, however,
+    duplicates are only detected (and rolled back) once the whole report is
+    read.
+
+    Besides plain XML files (*.xml), the parser reads reports from gzip
+    compressed files (*.gz), zip archives (*.zip), e-mail messages with report
+    attachments (*.eml), mbox files (*.mbox) and Maildir directories, as they
+    are typically delivered to DMARC `rua` addresses, without extracting them
+    to disk first. Hashes (see above) are computed for each extracted report.
+
+    Use `--watch` to keep running and parse new report files as they arrive
+    in the passed directories, e.g. from a mail delivery agent. New files are
+    detected with inotify if the optional `inotify_simple` package is
+    installed, or else (or with `--poll`) by listing the directories every
+    `--poll-interval` seconds. Detected files are queued for parsing in a
+    bounded queue (see `--queue-size`). With `--workers`, as many files (but
+    at least one per worker) are handed to the worker processes at once, and
+    the next file only once a previous one is parsed. Maildir directories are
+    not watched.
+    The parser stops after the reports in progress on SIGTERM or SIGINT.
+
+    Use `--progress` to log the number of parsed files, files and records per
+    second and the estimated remaining time every PROGRESS_SECONDS seconds. At
+    the end of each run, the outcomes, throughput and the time spent in each
+    stage of parsing (reading, hashing, XML parsing, GeoIP lookups and
+    storing) are logged, and can be written as JSON object with
+    `--summary-json`. Messages about single files are only logged with
+    `--verbosity 2` or higher.
+
+    Use `--archive-dir` and `--failed-dir` to move parsed report files out of
+    the way, i.e. files whose reports were stored (or already stored) to the
+    archive directory and files that failed or contained no report to the
+    failed directory (the failure ledger is updated accordingly).
+
+    The statistics of the Overview page are recomputed and cached after
+    reports were stored, at most every OVERVIEW_SECONDS seconds while the
+    parser runs (e.g. with `--watch`) and once at the end of each run.
 
 <Usage>
     ```
     python manage.py parse \
-      [--univie] [--type (in|out)] <dmarc-aggregate-report>.xml, ...
+      [--univie] [--type (in|out)] [--batch-size <n>] [--retry-failed] \
+      [--workers <n>] [--stream] [--no-prescan] [--rescan] \
+      [--watch [--poll] [--poll-interval <seconds>] [--queue-size <n>]] \
+      [--archive-dir <dir>] [--failed-dir <dir>] [--progress] \
+      [--summary-json <path>] [--geoip-db <path>] \
+      [--geoip-db-mode (auto|mmap|file|memory)] [--geoip-cache-size <n>] \
+      [--geoip-prefix] \
+      [(<dmarc-aggregate-report>.(xml|gz|zip|eml|mbox) | <maildir>), ...]
 
     ```
 
@@ -56,29 +132,123 @@
 import xml.etree.ElementTree
 
 import os
+import io
 import datetime
+import itertools
+import functools
+import collections
+import multiprocessing
+import threading
+import signal
+import shutil
+import time
+import json
+import Queue
+
+import gzip
+import zipfile
+import email
+import mailbox
 
 import logging
 import pytz
-import hashlib
-import geoip2.database
 
-from django.core.management.base import BaseCommand
-from django.core.exceptions import ObjectDoesNotExist
+try:
+    import inotify_simple
+
+except ImportError:
+    inotify_simple = None
+
+from django.core.management.base import BaseCommand, CommandError
 from django.conf import settings
+from django.db import connection, connections, transaction, IntegrityError
 
-from website import choices
-from website.models import (Report, Reporter, ReportError, Record,
-        PolicyOverrideReason, AuthResultDKIM, AuthResultSPF)
+from website import choices, geoip, hashing
+from website.models import (Domain, Report, Reporter, ReportError, Record,
+        PolicyOverrideReason, AuthResultDKIM, AuthResultSPF, RecordFact,
+        RecordRollup, FailedReport, ParsedFile)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("parse")
 
-geoip_reader = geoip2.database.Reader(settings.GEO_LITE2_CITY_DB)
+# Opens the GeoLite2 db on first use (see `website.geoip`)
+geoip_lookup = geoip.CountryLookup(settings.GEO_LITE2_DB,
+        settings.GEO_LITE2_DB_MODE)
 
-UNVIE = False
+UNIVIE = False
 REPORT_TYPE = choices.INCOMING
 
+# Maximum number of objects per INSERT statement when storing report data
+BATCH_SIZE = 1000
+
+# Parse report files incrementally (see `Command.stream`)
+STREAM = False
+
+# Hash algorithm for report files (see `website.hashing`)
+HASH_ALGORITHM = settings.REPORT_HASH_ALGORITHM
+
+# Read files even if they are unchanged since they were last parsed
+RESCAN = False
+
+# Hashes of stored reports, ids of stored reporters keyed by their identity,
+# ids of stored domains keyed by their name, sizes and modification times
+# of parsed files keyed by their path and paths of the failure ledger, loaded
+# once per run (see `_prescan`), or None if the db is queried instead
+KNOWN_HASHES = None
+KNOWN_REPORTERS = None
+KNOWN_DOMAINS = None
+KNOWN_FILES = None
+KNOWN_FAILED = None
+
+# Sizes and modification times of parsed files keyed by their path, waiting
+# to be stored with the next batch (see `_add_parsed_file`), at least every
+# PARSED_FILES_SECONDS seconds
+PARSED_FILES = {}
+PARSED_FILES_SECONDS = 60
+
+# Directories to move parsed report files to, or None to leave them in place
+# (see `Command.finish`)
+ARCHIVE_DIR = None
+FAILED_DIR = None
+
+# Seconds between directory listings when watching directories without
+# inotify, and maximum number of detected files waiting to be parsed
+POLL_INTERVAL = 5
+QUEUE_SIZE = 100
+
+# Set on SIGTERM or SIGINT to stop watching directories (see `Command.watch`)
+STOP = threading.Event()
+
+# Unknown values of choice fields (see `website.choices`) in parsed reports,
+# counted per element path and value (see `_to_numeric`)
+UNKNOWN_VALUES = collections.Counter()
+
+# Counters and stage timings (see STAGES) of the current task (see
+# `_parse_task`), summed up in the run summary
+STATS = collections.Counter()
+
+# Stages of parsing a report, whose durations are added to STATS as
+# "time_<stage>". The "db" stage comprises everything that is not measured
+# separately, i.e. mostly creating objects and storing them to the db.
+STAGES = ("read", "hash", "xml_parse", "geoip", "db")
+
+# Log a progress message every PROGRESS_INTERVAL parsed files, or with
+# `--progress` a detailed progress message every PROGRESS_SECONDS seconds
+PROGRESS_INTERVAL = 100
+PROGRESS = False
+PROGRESS_SECONDS = 10
+
+# Recompute the Overview page statistics at most every OVERVIEW_SECONDS
+# seconds while reports are stored (see `Report.cacheOverviewSummaries`)
+OVERVIEW_SECONDS = 60
+
+# Outcomes of parsing a single report, counted in the run summary
+STORED = "stored"
+DUPLICATE = "duplicate"
+FAILED = "failed"
+SKIPPED = "skipped"
+UNCHANGED = "unchanged"
+
 
 class Command(BaseCommand):
     help = "Parses DMARC aggregate reports into DMARC VIEWER db."
@@ -86,7 +256,7 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
 
         # One or more file/directory names for aggregate reports
-        parser.add_argument("path", nargs="+", type=str,
+        parser.add_argument("path", nargs="*", type=str,
                 help="File or directory path(s) to DMARC aggregate report(s)")
 
         # Report type - default is "in"
@@ -98,85 +268,767 @@ class Command(BaseCommand):
                 action="store_true", help=("Parse special anonymized format "
                 "used for University of Vienna's incoming reports"))
 
+        parser.add_argument("--batch-size", dest="batch_size",
+                default=BATCH_SIZE, type=int, help=("Maximum number of"
+                " records, authentication results, etc. stored to the db per"
+                " INSERT statement (default {})".format(BATCH_SIZE)))
+
+        parser.add_argument("--retry-failed", dest="retry_failed",
+                default=False, action="store_true", help=("Re-parse report"
+                " files that could not be stored in a previous run, using the"
+                " report type of that run"))
+
+        parser.add_argument("--workers", dest="workers", default=1, type=int,
+                help=("Number of processes that parse report files in"
+                " parallel (default 1)"))
+
+        parser.add_argument("--geoip-db", dest="geoip_db",
+                default=settings.GEO_LITE2_DB, help=("Path to Maxmind"
+                " GeoLite2 City or Country db (default {})".format(
+                settings.GEO_LITE2_DB)))
+
+        parser.add_argument("--geoip-db-mode", dest="geoip_db_mode",
+                default=settings.GEO_LITE2_DB_MODE,
+                choices=sorted(geoip.MODES), help=("Mode to open the GeoLite2"
+                " db with (default {})".format(settings.GEO_LITE2_DB_MODE)))
+
+        parser.add_argument("--geoip-cache-size", dest="geoip_cache_size",
+                default=geoip.DEFAULT_CACHE_SIZE, type=int, help=("Maximum"
+                " number of cached GeoIP lookups (default {}, 0 disables the"
+                " cache)".format(geoip.DEFAULT_CACHE_SIZE)))
+
+        parser.add_argument("--geoip-prefix", dest="geoip_prefix",
+                default=False, action="store_true", help=("Cache GeoIP"
+                " lookups per /{0} (IPv4) or /{1} (IPv6) network instead of"
+                " per IP address".format(geoip.PREFIX_V4, geoip.PREFIX_V6)))
+
+        parser.add_argument("--stream", dest="stream", default=False,
+                action="store_true", help=("Parse and store reports"
+                " incrementally, reading each file only once. Keeps memory"
+                " usage low for very large reports, but detects duplicates"
+                " only after the whole report is parsed"))
+
+        parser.add_argument("--no-prescan", dest="prescan", default=True,
+                action="store_false", help=("Don't load the hashes of all"
+                " stored reports and all stored reporters at the beginning of"
+                " the run, but query the db for each report instead"))
+
+        parser.add_argument("--rescan", dest="rescan", default=False,
+                action="store_true", help=("Read all files, including those"
+                " that are unchanged since they were last parsed"))
+
+        parser.add_argument("--watch", dest="watch", default=False,
+                action="store_true", help=("Keep running and parse new report"
+                " files as they arrive in the passed directories, until"
+                " SIGTERM or SIGINT"))
+
+        parser.add_argument("--poll", dest="poll", default=False,
+                action="store_true", help=("Detect new files with --watch by"
+                " listing the directories regularly, even if inotify is"
+                " available"))
+
+        parser.add_argument("--poll-interval", dest="poll_interval",
+                default=POLL_INTERVAL, type=float, help=("Seconds between"
+                " directory listings with --watch --poll (default {})"
+                .format(POLL_INTERVAL)))
+
+        parser.add_argument("--queue-size", dest="queue_size",
+                default=QUEUE_SIZE, type=int, help=("Maximum number of"
+                " detected files waiting to be parsed with --watch, and of"
+                " files handed to worker processes at once with --workers"
+                " (default {})".format(QUEUE_SIZE)))
+
+        parser.add_argument("--progress", dest="progress", default=False,
+                action="store_true", help=("Log files and records parsed per"
+                " second and the estimated remaining time every {} seconds"
+                .format(PROGRESS_SECONDS)))
+
+        parser.add_argument("--summary-json", dest="summary_json",
+                default=None, help=("Write summary of the run as JSON object"
+                " to this file ('-' for stdout)"))
+
+        parser.add_argument("--archive-dir", dest="archive_dir", default=None,
+                help=("Move parsed report files whose reports are stored to"
+                " this directory"))
+
+        parser.add_argument("--failed-dir", dest="failed_dir", default=None,
+                help=("Move report files that could not be stored or contain"
+                " no report to this directory"))
+
     def handle(self, *args, **options):
         """Entry point for parser. Iterates over file_name arguments."""
 
-        global UNIVIE
-        global REPORT_TYPE
+        global BATCH_SIZE
+        global STREAM
+        global RESCAN
+        global ARCHIVE_DIR
+        global FAILED_DIR
+        global POLL_INTERVAL
+        global QUEUE_SIZE
+        global PROGRESS
+        global KNOWN_HASHES
+        global KNOWN_REPORTERS
+        global KNOWN_DOMAINS
+        global KNOWN_FILES
+        global KNOWN_FAILED
+        global geoip_lookup
+
+        # Module globals keep their values between calls in the same process
+        # (e.g. with `call_command`), reset those that are not set from
+        # options below on every call
+        ARCHIVE_DIR = FAILED_DIR = None
+        KNOWN_HASHES = KNOWN_REPORTERS = KNOWN_DOMAINS = KNOWN_FILES = \
+                KNOWN_FAILED = None
+        STOP.clear()
+
+        if not options["path"] and not options["retry_failed"]:
+            raise CommandError("Pass at least one path or --retry-failed.")
+
+        if options["workers"] < 1:
+            raise CommandError("Pass a positive number of --workers.")
+
+        if options["workers"] > 1 and connection.vendor == "sqlite":
+            raise CommandError("SQLite does not support concurrent writes,"
+                    " use --workers with PostgreSQL only.")
+
+        if options["watch"] and not all(os.path.isdir(path) and
+                not _is_maildir(path) for path in options["path"]):
+            raise CommandError("Pass only directories (but no Maildir"
+                    " directories) with --watch.")
+
+        if options["queue_size"] < 1:
+            raise CommandError("Pass a positive --queue-size.")
+
+        for dir_option in ("archive_dir", "failed_dir"):
+            if options[dir_option] and not os.path.isdir(options[dir_option]):
+                try:
+                    os.makedirs(options[dir_option])
+                except OSError as e:
+                    raise CommandError("Could not create directory '{0}': {1}"
+                            .format(options[dir_option], e))
+
+        try:
+            hashing.new(HASH_ALGORITHM)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        # Messages about single files are logged at debug level
+        if options["verbosity"] > 1:
+            logger.setLevel(logging.DEBUG)
+
+        BATCH_SIZE = options["batch_size"]
+        STREAM = options["stream"]
+        RESCAN = options["rescan"]
+        PROGRESS = options["progress"]
+        POLL_INTERVAL = options["poll_interval"]
+        QUEUE_SIZE = options["queue_size"]
+
+        if options["archive_dir"]:
+            ARCHIVE_DIR = os.path.abspath(options["archive_dir"])
 
-        UNIVIE = options["univie"]
+        if options["failed_dir"]:
+            FAILED_DIR = os.path.abspath(options["failed_dir"])
+
+        geoip_lookup = geoip.CountryLookup(options["geoip_db"],
+                options["geoip_db_mode"], options["geoip_cache_size"],
+                options["geoip_prefix"])
+
+        # Fail early instead of for every record if the db can't be opened
+        try:
+            geoip_lookup.reader
+        except Exception as e:
+            raise CommandError("Could not open GeoLite2 db '{0}': {1}".format(
+                    options["geoip_db"], e))
+
+        # Load known reports and reporters before worker processes are forked,
+        # so that they inherit them
+        if options["prescan"]:
+            _prescan()
+
+        # Each task is a tuple of path, report type and univie format flag
+        tasks = []
+
+        # Replay previously failed reports first, using the options of the
+        # run in which they failed
+        if options["retry_failed"]:
+            tasks = self.retry_failed()
 
         if options["type"] == "in":
-            REPORT_TYPE = choices.INCOMING
+            report_type = choices.INCOMING
 
         elif options["type"] == "out":
-            REPORT_TYPE = choices.OUTGOING
+            report_type = choices.OUTGOING
 
-        # Iterate over files/directories
-        for file_name in options["path"]:
-            self.walk(file_name)
+        if options["watch"]:
+            # Stop watching gracefully, i.e. after the reports in progress
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                signal.signal(signum, _stop)
+
+            file_names = self.watch(options["path"], options["poll"])
+
+        else:
+            # Iterate over files/directories
+            file_names = (file_name for path in options["path"]
+                    for file_name in self.walk(path))
+
+        # Walk all directories up front to estimate the remaining time
+        task_cnt = None
+        if PROGRESS and not options["watch"]:
+            file_names = list(file_names)
+            task_cnt = len(tasks) + len(file_names)
+
+        tasks = itertools.chain(tasks, ((file_name, report_type,
+                options["univie"]) for file_name in file_names))
+
+        summary = self.run(tasks, options["workers"], task_cnt)
+
+        if options["summary_json"] == "-":
+            self.stdout.write(json.dumps(summary, indent=2, sort_keys=True))
+
+        elif options["summary_json"]:
+            try:
+                with open(options["summary_json"], "w") as json_file:
+                    json.dump(summary, json_file, indent=2, sort_keys=True)
+            except IOError as e:
+                raise CommandError("Could not write summary to '{0}': {1}"
+                        .format(options["summary_json"], e))
+
+    def run(self, tasks, workers, task_cnt=None):
+        """Parses report files of passed tasks, either in this process or
+        spread over a pool of worker processes, and logs progress and a
+        summary of the outcomes. The number of tasks, if known, is used to
+        estimate the remaining time. Returns the summary as dict. """
+
+        if workers > 1:
+            # Worker processes are forked and must not share this process' db
+            # connection, they each open their own (see `_init_worker`)
+            connections.close_all()
+            pool = multiprocessing.Pool(workers, initializer=_init_worker)
+
+            # The pool takes tasks as fast as it can, e.g. all files that
+            # `watch` detects, which would never fill up its bounded queue.
+            # Hence, new tasks are only handed to the pool once results of
+            # previous ones came back.
+            pending = threading.BoundedSemaphore(max(QUEUE_SIZE, workers))
+            results = _iter_pool_results(pool.imap_unordered(_parse_task,
+                    _iter_pending(tasks, pending)), pending)
+
+        else:
+            pool = None
+            results = itertools.imap(_parse_task, tasks)
+
+        start = last_progress = last_overview = last_parsed_files = \
+                time.time()
+        stored_since_overview = False
+        summary = dict.fromkeys((STORED, DUPLICATE, FAILED, SKIPPED,
+                UNCHANGED), 0)
+        stats = collections.Counter()
+        unknown_values = collections.Counter()
+        file_cnt = 0
+        for file_cnt, (path, outcomes, file_stat, task_stats) in enumerate(
+                results, 1):
+            for outcome in outcomes:
+                summary[outcome] += 1
+
+            unknown_values.update(task_stats.pop("unknown_values"))
+            stats.update(task_stats)
+
+            self.finish(path, outcomes, file_stat)
+
+            # Store parsed files in batches (see `_add_parsed_file`)
+            if (len(PARSED_FILES) >= BATCH_SIZE or PARSED_FILES and
+                    time.time() - last_parsed_files >= PARSED_FILES_SECONDS):
+                _store_parsed_files()
+                last_parsed_files = time.time()
+
+            # Reports of finished tasks are committed, also in worker processes
+            if STORED in outcomes:
+                stored_since_overview = True
+
+            if (stored_since_overview and
+                    time.time() - last_overview >= OVERVIEW_SECONDS):
+                Report.cacheOverviewSummaries()
+                last_overview = time.time()
+                stored_since_overview = False
+
+            if PROGRESS:
+                now = time.time()
+                if now - last_progress >= PROGRESS_SECONDS:
+                    last_progress = now
+                    self.log_progress(file_cnt, task_cnt, stats["records"],
+                            now - start)
+
+            elif file_cnt % PROGRESS_INTERVAL == 0:
+                logger.info("Parsed {} files".format(file_cnt))
+
+        if pool:
+            pool.close()
+            pool.join()
+
+        _store_parsed_files()
+
+        if stored_since_overview:
+            Report.cacheOverviewSummaries()
+
+        # Avoid division by zero for runs without any files
+        seconds = max(time.time() - start, 0.001)
+
+        logger.info("Parsed {file_cnt} files: {stored} reports stored,"
+                " {duplicate} duplicates, {failed} failed, {skipped} files"
+                " skipped, {unchanged} unchanged files skipped".format(
+                file_cnt=file_cnt, **summary))
+
+        logger.info("Parsed {0} records in {1:.1f} s ({2:.1f} files/s,"
+                " {3:.1f} records/s)".format(stats["records"], seconds,
+                file_cnt / seconds, stats["records"] / seconds))
+
+        # With worker processes these are the sums over all processes
+        stage_seconds = sum(stats["time_" + stage] for stage in STAGES)
+        logger.info("Time per stage: {}".format(", ".join(
+                "{0} {1:.2f} s ({2:.0%})".format(stage,
+                stats["time_" + stage], stats["time_" + stage] /
+                stage_seconds if stage_seconds else 0) for stage in STAGES)))
+
+        geoip_lookups = stats["geoip_hits"] + stats["geoip_misses"]
+        logger.info("GeoIP lookups: {hits} cache hits, {misses} misses"
+                " ({rate:.1%} hit rate), {not_found} addresses not found"
+                .format(hits=stats["geoip_hits"],
+                misses=stats["geoip_misses"], rate=(
+                float(stats["geoip_hits"]) / geoip_lookups
+                if geoip_lookups else 0), not_found=stats["geoip_not_found"]))
+
+        for (element_path, value), cnt in sorted(unknown_values.items()):
+            logger.warning("Found unknown value '{0}' of '{1}' {2} times"
+                    .format(value, element_path, cnt))
+
+        return {
+            "files": file_cnt,
+            "reports": summary,
+            "records": stats["records"],
+            "seconds": seconds,
+            "files_per_second": file_cnt / seconds,
+            "records_per_second": stats["records"] / seconds,
+            "stage_seconds": {stage: stats["time_" + stage]
+                    for stage in STAGES},
+            "geoip": {
+                "cache_hits": stats["geoip_hits"],
+                "cache_misses": stats["geoip_misses"],
+                "not_found": stats["geoip_not_found"]
+            },
+            "unknown_values": [
+                {"element": element_path, "value": value, "count": cnt}
+                for (element_path, value), cnt in sorted(
+                        unknown_values.items())
+            ]
+        }
+
+    def log_progress(self, file_cnt, task_cnt, record_cnt, seconds):
+        """Log number of parsed files, files and records per second and, if
+        the number of files to parse is known, the estimated remaining time.
+        """
+        files_per_second = file_cnt / seconds
+        message = "Parsed {0} files".format(file_cnt)
+        if task_cnt:
+            message = "Parsed {0}/{1} files ({2:.1%})".format(file_cnt,
+                    task_cnt, float(file_cnt) / task_cnt)
+
+        message += ", {0:.1f} files/s, {1:.1f} records/s".format(
+                files_per_second, record_cnt / seconds)
+
+        if task_cnt:
+            message += ", ETA {}".format(datetime.timedelta(seconds=int(
+                    (task_cnt - file_cnt) / files_per_second)))
+
+        logger.info(message)
 
     def walk(self, path):
-        """Recursively walk over passed files. """
+        """Recursively walk over passed files and yield their paths. Maildir
+        directories are yielded as a whole and not walked into. """
 
-        if os.path.isfile(path):
-            self.parse(path)
+        if os.path.isfile(path) or _is_maildir(path):
+            yield path
 
         elif os.path.isdir(path):
             for root, dirs, files in os.walk(path):
                 for file in files:
-                    self.parse(os.path.join(root, file))
+                    yield os.path.join(root, file)
+
+                for dir in list(dirs):
+                    if _is_maildir(os.path.join(root, dir)):
+                        dirs.remove(dir)
+                        yield os.path.join(root, dir)
 
         else:
             logger.info("Could not find path '{}'.".format(path))
 
-    def parse(self, path):
-        """Parses single DMARC aggregate report and stores to db. """
+    def watch(self, paths, poll):
+        """Yield paths of the files in passed directories, first of those
+        that exist and then of new files as they arrive, until STOP is set.
+        Files are detected by a separate thread (see `_watch_inotify` and
+        `_watch_poll`), which waits for free space in a queue of QUEUE_SIZE
+        files. """
 
-        logger.info("Parsing '{}'".format(path))
-        log_prefix = "Report '{path}:'".format(path=path)
-        # Skip files that don't end with ".xml"
-        if not path.endswith(".xml"):
-            logger.info("{0} Skipping non *.xml file names."
-                    .format(log_prefix))
+        if inotify_simple and not poll:
+            watch_dirs = _watch_inotify
+
+        else:
+            if not poll:
+                logger.info("Package 'inotify_simple' not found, listing"
+                        " watched directories every {} seconds".format(
+                        POLL_INTERVAL))
+            watch_dirs = _watch_poll
+
+        file_queue = Queue.Queue(QUEUE_SIZE)
+        watcher = threading.Thread(target=watch_dirs, args=(
+                [os.path.abspath(path) for path in paths], file_queue))
+        watcher.daemon = True
+        watcher.start()
+
+        logger.info("Watching {} for new reports".format(", ".join(
+                "'{}'".format(path) for path in paths)))
+
+        while not STOP.is_set():
+            # Wake up regularly to check if we should stop
+            try:
+                path = file_queue.get(timeout=1)
+            except Queue.Empty:
+                continue
+
+            # Files might be detected twice, e.g. if they are rewritten
+            if os.path.isfile(path):
+                yield path
+
+        logger.info("Stopped watching for new reports")
+
+    def finish(self, path, outcomes, file_stat):
+        """Remove parsed report file from the failure ledger unless a report
+        failed, and remember its passed `os.stat` result (see `parse`) to skip
+        it as long as it is unchanged, unless it is moved away.
+
+        Move the file to ARCHIVE_DIR if all its reports are stored (or were
+        already stored), or to FAILED_DIR if a report failed or it contains no
+        report. The file stays in place if the respective directory is not
+        set, if it was not parsed because it is unchanged, and if it is a
+        Maildir directory.
+
+        Called in the main process, also for files parsed by worker processes.
+        """
+
+        if UNCHANGED in outcomes:
+            return
+
+        if FAILED in outcomes:
+            # The file was added to the ledger (see `fail`)
+            _add_failed_report(path)
+
+        else:
+            _remove_failed_report(path)
+            if file_stat and not ARCHIVE_DIR:
+                _add_parsed_file(path, file_stat)
+
+        if not os.path.isfile(path):
+            return
+
+        if FAILED in outcomes or SKIPPED in outcomes:
+            target_dir = FAILED_DIR
+
+        else:
+            target_dir = ARCHIVE_DIR
+
+        if not target_dir:
             return
 
-        # Try parsing XML tree
         try:
-            with open(path) as file:
-                # Parse the file into XML Element Tree
-                xml_tree = xml.etree.ElementTree.parse(file)
-        except Exception as e:
-            logger.error("{0} Could not parse XML tree.".format(log_prefix))
+            target_path = _move(path, target_dir)
+
+        except (IOError, OSError) as e:
+            logger.error("Report '{0}:' Could not move file to '{1}': {2}"
+                    .format(path, target_dir, e))
             return
 
-        # We are good, do the md5 hash of the vanilla file too
+        # Keep the failure ledger pointing to the file
+        if FAILED in outcomes:
+            FailedReport.objects.filter(path=os.path.abspath(path)).update(
+                    path=target_path)
+            if KNOWN_FAILED is not None:
+                KNOWN_FAILED.discard(os.path.abspath(path))
+
+            _add_failed_report(target_path)
+
+    def retry_failed(self):
+        """Return parse tasks for the report files of the failure ledger, each
+        with the report type and format of the run in which it failed. The
+        entries stay in the ledger until their file is parsed without errors
+        (see `finish`), reports that fail again update their entry (see
+        `fail`). """
+
+        tasks = []
+        for failed_report in FailedReport.objects.order_by("date_failed"):
+            logger.debug("Retrying failed report '{}'".format(
+                    failed_report.path))
+            tasks.append((failed_report.path, failed_report.report_type,
+                    failed_report.univie))
+
+        return tasks
+
+    def fail(self, path, name, file_hash, error):
+        """Log error for report (named `name` in report file `path`) and add
+        or update the report file's entry in the failure ledger, so that it
+        can be replayed using `--retry-failed`. """
+
+        logger.error("Report '{0}:' {1}".format(name, error))
+        if name != path:
+            error = "{0}: {1}".format(name, error)
+
         try:
-            with open(path) as file:
-                hasher = hashlib.md5()
-                hasher.update(file.read())
-                file_hash = hasher.hexdigest()
+            FailedReport.objects.update_or_create(
+                    path=os.path.abspath(path), defaults={
+                        "report_hash": file_hash,
+                        "report_type": REPORT_TYPE,
+                        "univie": UNIVIE,
+                        "error": error
+                    })
         except Exception as e:
-            logger.error("{0} Could not hash file contents: {1}"
-                .format(log_prefix, e))
-            return
+            logger.error("Report '{0}:' Could not add report to failure"
+                    " ledger: {1}".format(name, e))
+
+    def parse(self, path, file_stat):
+        """Parses all DMARC aggregate reports contained in a file (see
+        `_extract_reports`) or Maildir directory and stores them to db.
+        Returns a list with one of `STORED`, `DUPLICATE` or `FAILED` per
+        report, `[SKIPPED]` if no report was found, or `[UNCHANGED]` if the
+        file was not read because its passed `os.stat` result shows that it is
+        unchanged since it was last parsed. The `os.stat` result is None for
+        Maildir directories, which are always read. """
+
+        if file_stat and not RESCAN and _is_parsed_file(path, file_stat):
+            logger.debug("Report '{0}:' Skipping unchanged file.".format(
+                    path))
+            return [UNCHANGED]
+
+        logger.debug("Parsing '{}'".format(path))
+        start = time.time()
+        measured_seconds = _measured_seconds()
+        outcomes = []
+        try:
+            for name, open_file in _extract_reports(path):
+                if STREAM:
+                    outcomes.append(self.parse_stream(path, name, open_file))
 
-        # FIXME: verify DMARC schema
+                else:
+                    outcomes.append(self.parse_report(path, name, open_file))
+
+        except Exception as e:
+            self.fail(path, path, None, "Could not extract reports: {}"
+                    .format(e))
+            outcomes.append(FAILED)
+
+        # Everything not measured in separate stages counts as "db" stage
+        STATS["time_db"] += (time.time() - start - _measured_seconds() +
+                measured_seconds)
+
+        if not outcomes:
+            logger.debug("Report '{0}:' Skipping file without DMARC aggregate"
+                    " reports (*.xml).".format(path))
+            outcomes = [SKIPPED]
+
+        return outcomes
+
+    def parse_report(self, path, name, open_file):
+        """Parses single DMARC aggregate report, named `name` and read from
+        the file object returned by `open_file`, and stores it to db. Returns
+        one of `STORED`, `DUPLICATE` or `FAILED`. """
 
-        # Skip rest if the file already exists based on the hash
-        if Report.objects.filter(report_hash=file_hash):
-            logger.info("{0} Skipping already stored report."
+        log_prefix = "Report '{name}:'".format(name=name)
+
+        # Read and hash the vanilla file in chunks first, keeping its contents
+        # to parse them without reading the file again
+        try:
+            with open_file() as file:
+                hashing_file = _HashingFile(file)
+                data = list(hashing.chunks(hashing_file))
+                file_hash = hashing_file.hexdigest()
+        except Exception as e:
+            self.fail(path, name, None, "Could not hash file contents: {}"
+                    .format(e))
+            return FAILED
+
+        # Skip rest if the file already exists based on the hash, without
+        # parsing it
+        if _is_stored_report(file_hash):
+            logger.debug("{0} Skipping already stored report."
                     .format(log_prefix))
-            return
+            return DUPLICATE
 
-        ##############################################################
-        # Translate DMARC aggregate report into dmarc-viewer model...
-        xml_root = xml_tree.getroot()
+        # Try parsing XML tree
+        start = time.time()
+        try:
+            xml_root = xml.etree.ElementTree.fromstring(b"".join(data))
+            del data
+        except Exception as e:
+            self.fail(path, name, file_hash, "Could not parse XML tree: {}"
+                    .format(e))
+            return FAILED
+
+        finally:
+            STATS["time_xml_parse"] += time.time() - start
+
+        # FIXME: verify DMARC schema
+
+        # Store the report and all its related objects in one transaction. If
+        # anything goes wrong nothing is stored, in particular no report hash
+        # that would prevent the report from being re-imported.
+        try:
+            with transaction.atomic():
+                self.store(xml_root, file_hash, log_prefix)
+
+            _add_stored_report(file_hash)
+
+        except IntegrityError as e:
+            # Another parser process might have stored the same report since
+            # we checked above
+            if Report.objects.filter(report_hash=file_hash).exists():
+                logger.debug("{0} Skipping concurrently stored report."
+                        .format(log_prefix))
+                return DUPLICATE
+
+            self.fail(path, name, file_hash, "Could not store report: {}"
+                    .format(e))
+            return FAILED
+
+        except Exception as e:
+            self.fail(path, name, file_hash, "Could not store report: {}"
+                    .format(e))
+            return FAILED
+
+        return STORED
+
+    def parse_stream(self, path, name, open_file):
+        """Parses single DMARC aggregate report incrementally while storing it
+        to db (see `stream` and `parse_report`). Returns one of `STORED`,
+        `DUPLICATE` or `FAILED`. """
+
+        log_prefix = "Report '{name}:'".format(name=name)
+
+        # Store the report in one transaction (see `parse_report`)
+        file_hash = None
+        try:
+            with transaction.atomic():
+                with open_file() as file:
+                    report, file_hash = self.stream(file, log_prefix)
+
+                # Duplicates can only be detected once the whole file is read,
+                # in which case we roll back everything stored so far
+                if _is_stored_report(file_hash):
+                    transaction.set_rollback(True)
+                    logger.debug("{0} Skipping already stored report."
+                            .format(log_prefix))
+                    return DUPLICATE
+
+                report.report_hash = file_hash
+                report.save(update_fields=["report_hash"])
+
+            _add_stored_report(file_hash)
+
+        except xml.etree.ElementTree.ParseError as e:
+            self.fail(path, name, None, "Could not parse XML tree: {}"
+                    .format(e))
+            return FAILED
+
+        except IntegrityError as e:
+            # Another parser process might have stored the same report since
+            # we checked above
+            if file_hash and Report.objects.filter(
+                    report_hash=file_hash).exists():
+                logger.debug("{0} Skipping concurrently stored report."
+                        .format(log_prefix))
+                return DUPLICATE
+
+            self.fail(path, name, file_hash, "Could not store report: {}"
+                    .format(e))
+            return FAILED
+
+        except Exception as e:
+            self.fail(path, name, file_hash, "Could not store report: {}"
+                    .format(e))
+            return FAILED
+
+        return STORED
+
+    def store(self, xml_root, file_hash, log_prefix):
+        """Translates DMARC aggregate report XML tree into dmarc-viewer model
+        and stores it to db. Raises an exception if any object cannot be
+        stored. Must be called inside a transaction (see `parse`). """
+
+        report = self.store_report(xml_root, file_hash, log_prefix)
+
+        # Store records in batches of at most BATCH_SIZE records
+        node_records = xml_root.findall('record')
+        for batch_idx in range(0, len(node_records), BATCH_SIZE):
+            self.store_records(report,
+                    node_records[batch_idx:batch_idx + BATCH_SIZE],
+                    batch_idx, log_prefix)
+
+    def stream(self, file, log_prefix):
+        """Incrementally translates DMARC aggregate report XML read from the
+        passed file object into dmarc-viewer model and stores it to db,
+        hashing the file contents on the fly. Parsed records are stored in
+        batches of BATCH_SIZE records and removed from the XML tree, so that
+        memory usage does not grow with the size of the report.
+
+        The report hash is only known once the whole file is read, hence it
+        is not stored with the report but returned together with the report,
+        so that the caller can check for duplicates. Raises an exception if
+        the report cannot be parsed or stored. Must be called inside a
+        transaction (see `parse_stream`).
+        """
+        hashing_file = _HashingFile(file)
+        context = _iterparse(hashing_file)
+
+        # The first event is the start of the root element, i.e. "feedback"
+        event, xml_root = next(context)
+
+        report = None
+        node_records = []
+        record_cnt = 0
+        for event, element in context:
+            if event != "end" or element.tag != "record":
+                continue
+
+            # Report metadata and policy are defined before the first record
+            if report is None:
+                report = self.store_report(xml_root, None, log_prefix)
+
+            node_records.append(element)
+            if len(node_records) == BATCH_SIZE:
+                self.store_records(report, node_records, record_cnt,
+                        log_prefix)
+                record_cnt += len(node_records)
+                node_records = []
+
+                # Remove stored records (and report metadata) from the tree
+                xml_root.clear()
+
+        # Reports without records
+        if report is None:
+            report = self.store_report(xml_root, None, log_prefix)
+
+        self.store_records(report, node_records, record_cnt, log_prefix)
+
+        return report, hashing_file.hexdigest()
+
+    def store_report(self, xml_root, file_hash, log_prefix):
+        """Translates report metadata and published policy of DMARC aggregate
+        report XML tree into dmarc-viewer model and stores the report, its
+        reporter and report errors to db. Returns the stored report. """
 
         # Create report object
         report = Report()
         report.report_hash = file_hash
 
+        # Cached analysis view data is outdated once the report is committed
+        Report.updateDataGeneration()
+
         # Assign report metadata
         report.report_type = REPORT_TYPE
         version = xml_root.findtext("version")
@@ -196,41 +1048,38 @@ class Command(BaseCommand):
         org_name = node_metadata.findtext("org_name")
         email = node_metadata.findtext("email")
         extra_contact_info = node_metadata.findtext("extra_contact_info")
-        try:
-            reporter = Reporter.objects.get(org_name=org_name, email=email,
-                    extra_contact_info=extra_contact_info)
-            logger.info(
+        reporter_id = _get_reporter_id(org_name, email, extra_contact_info)
+        if reporter_id:
+            logger.debug(
                     "{0} Re-using existing reporter '{1}'"
                     .format(log_prefix, org_name))
-        except ObjectDoesNotExist as e:
-            reporter = Reporter()
-            reporter.org_name = org_name
-            reporter.email = email
-            reporter.extra_contact_info = extra_contact_info
+        else:
+            reporter_id = _create_reporter(org_name, email,
+                    extra_contact_info)
 
-            # New reporter has to be stored to db to reference it in report
-            try:
-                reporter.save()
-            except Exception as e:
-                logger.error(
-                        "{0} Could not save reporter: {1}"
-                        .format(log_prefix, e))
-                return
+        # The report references a reporter object (not only its id) even if
+        # the reporter exists, so that the report's record facts (see
+        # `store_records`) get the reporter without querying the db
+        reporter = Reporter(id=reporter_id)
+        reporter.org_name = org_name
+        reporter.email = email
+        reporter.extra_contact_info = extra_contact_info
 
         # Assign reporter
         report.reporter = reporter
 
         # Assign policy published
         node_policy_published = xml_root.find('policy_published')
-        report.domain = node_policy_published.findtext('domain')
-        report.adkim = choices._string_to_numeric(choices.ALIGNMENT_MODE,
-                node_policy_published.findtext('adkim'))
-        report.aspf = choices._string_to_numeric(choices.ALIGNMENT_MODE,
-                node_policy_published.findtext('aspf'))
-        report.p = choices._string_to_numeric(choices.DISPOSITION_TYPE,
-                node_policy_published.findtext('p'))
-        report.sp = choices._string_to_numeric(choices.DISPOSITION_TYPE,
-                node_policy_published.findtext('sp'))
+        domain = node_policy_published.findtext('domain')
+        report.domain_id = _get_domain_ids([domain]).get(domain)
+        report.adkim = _to_numeric(choices.ALIGNMENT_MODE_NUMERIC,
+                node_policy_published, 'adkim')
+        report.aspf = _to_numeric(choices.ALIGNMENT_MODE_NUMERIC,
+                node_policy_published, 'aspf')
+        report.p = _to_numeric(choices.DISPOSITION_TYPE_NUMERIC,
+                node_policy_published, 'p')
+        report.sp = _to_numeric(choices.DISPOSITION_TYPE_NUMERIC,
+                node_policy_published, 'sp')
         # Field not in https://dmarc.org/dmarc-xml/0.1/rua.xsd
         report.fo = node_policy_published.findtext('fo')
         pct = node_policy_published.findtext('pct')
@@ -238,26 +1087,40 @@ class Command(BaseCommand):
             report.pct = int(pct)
 
         # Store report to db
-        try:
-            report.save()
-        except Exception as e:
-            logger.error("{0} Could not save report: {1}"
-                    .format(log_prefix, e))
-            return
+        report.save()
 
         # Create report error objects
+        report_errors = []
         for node_error in node_metadata.findall('error'):
             error = ReportError()
             error.error = node_error.text
             error.report = report
-            try:
-                error.save()
-            except Exception as e:
-                logger.warning("{0} Could not save report error: {1}"
-                        .format(log_prefix, e))
+            report_errors.append(error)
+
+        _bulk_create(ReportError, report_errors)
+
+        return report
 
-        # Create record objects
-        for record_idx, node_record in enumerate(xml_root.findall('record')):
+    def store_records(self, report, node_records, first_record_idx,
+            log_prefix):
+        """Translates passed DMARC aggregate report XML record elements of
+        passed report into dmarc-viewer model and stores them to db. The index
+        of the first passed record within the report is used for logging. """
+
+        STATS["records"] += len(node_records)
+
+        # Create record objects and their related objects in memory first and
+        # write them to the db table by table afterwards (see
+        # `_store_record_entries`). Each entry is a tuple of the record and
+        # lists of the related policy override reasons, DKIM and SPF
+        # authentication results.
+        record_entries = []
+
+        # Tuples of objects, domain field names and domain names, to assign
+        # the domain ids of all objects at once
+        domain_fields = []
+        for record_idx, node_record in enumerate(node_records,
+                first_record_idx):
             record = Record()
             record.report = report
 
@@ -272,11 +1135,21 @@ class Command(BaseCommand):
                             'geoip', '')
                 else:
                     record.source_ip = ip_element.text
-                    response = geoip_reader.city(record.source_ip)
-                    record.country_iso_code = response.country.iso_code
+                    start = time.time()
+                    try:
+                        record.country_iso_code = (
+                                geoip_lookup.country_iso_code(
+                                record.source_ip))
+                    finally:
+                        STATS["time_geoip"] += time.time() - start
+
+                    if record.country_iso_code is None:
+                        raise ValueError("The address is not in the"
+                                " database.")
 
             except Exception as e:
-                logger.warning(
+                STATS["geoip_not_found"] += 1
+                logger.debug(
                         "{0} Could not find ISO country code for IP '{1}'"
                         " in record {2}: {3}"
                         .format(log_prefix, record.source_ip, record_idx, e))
@@ -284,101 +1157,845 @@ class Command(BaseCommand):
             # Assign record info
             record.count = int(node_row.findtext('count'))
             node_policy_evaluated = node_row.find('policy_evaluated')
-            record.disposition = choices._string_to_numeric(
-                    choices.DISPOSITION_TYPE,
-                    node_policy_evaluated.findtext('disposition'))
-            record.dkim = choices._string_to_numeric(choices.DMARC_RESULT,
-                    node_policy_evaluated.findtext('dkim'))
-            record.spf = choices._string_to_numeric(choices.DMARC_RESULT,
-                    node_policy_evaluated.findtext('spf'))
+            record.disposition = _to_numeric(choices.DISPOSITION_TYPE_NUMERIC,
+                    node_policy_evaluated, 'disposition')
+            record.dkim = _to_numeric(choices.DMARC_RESULT_NUMERIC,
+                    node_policy_evaluated, 'dkim')
+            record.spf = _to_numeric(choices.DMARC_RESULT_NUMERIC,
+                    node_policy_evaluated, 'spf')
 
             node_identifiers = node_record.find('identifiers')
             if node_identifiers is not None:
-                record.envelope_to = node_identifiers.findtext(
-                        'envelope_to')
+                domain_fields.append((record, "envelope_to_id",
+                        node_identifiers.findtext('envelope_to')))
                 # Field not in https://dmarc.org/dmarc-xml/0.1/rua.xsd
-                record.envelope_from = node_identifiers.findtext(
-                        'envelope_from')
-                record.header_from = node_identifiers.findtext(
-                        'header_from')
-
-            try:
-                record.save()
-            except Exception as e:
-                logger.warning("{0} Could not save record '{1}': {2}"
-                        .format(log_prefix, record_idx, e))
-                return
+                domain_fields.append((record, "envelope_from_id",
+                        node_identifiers.findtext('envelope_from')))
+                domain_fields.append((record, "header_from_id",
+                        node_identifiers.findtext('header_from')))
 
             # Create policy override reason objects
-            for reason_idx, node_reason in enumerate(
-                    node_policy_evaluated.findall('reason')):
+            reasons = []
+            for node_reason in node_policy_evaluated.findall('reason'):
                 reason = PolicyOverrideReason()
-                reason.record = record
-                reason.type = choices._string_to_numeric(
-                        choices.POLICY_REASON_TYPE,
-                        node_reason.findtext('type'))
-                reason.comment = node_reason.findtext('comment')
-
-                try:
-                    reason.save()
-                except Exception as e:
-                    logger.warning(
-                            "{0} Could not save policy override reason '{1}'"
-                            " for record '{2}': {3}"
-                            .format(log_prefix, reason_idx, record_idx, e))
+                reason.reason_type = _to_numeric(
+                        choices.POLICY_REASON_TYPE_NUMERIC, node_reason,
+                        'type')
+                reason.reason_comment = node_reason.findtext('comment')
+                reasons.append(reason)
 
             # Find authentication results
             node_auth_results = node_record.find('auth_results')
 
-            # DKIM result counter (performance boost for data analysis)
-            dkim_count = 0
-
             # Create DKIM authentication result objects
-            for dkim_result_idx, node_dkim_result in enumerate(
-                    node_auth_results.findall('dkim')):
+            results_dkim = []
+            for node_dkim_result in node_auth_results.findall('dkim'):
                 result_dkim = AuthResultDKIM()
-                result_dkim.record = record
-                result_dkim.domain = node_dkim_result.findtext('domain')
+                domain_fields.append((result_dkim, "domain_id",
+                        node_dkim_result.findtext('domain')))
                 # Field not in https://dmarc.org/dmarc-xml/0.1/rua.xsd
                 result_dkim.selector = node_dkim_result.findtext('selector')
-                result_dkim.result = choices._string_to_numeric(
-                        choices.DKIM_RESULT,
-                        node_dkim_result.findtext('result'))
+                result_dkim.result = _to_numeric(choices.DKIM_RESULT_NUMERIC,
+                        node_dkim_result, 'result')
                 result_dkim.human_result = node_dkim_result.findtext(
                         'human_result')
-                try:
-                    result_dkim.save()
-                    dkim_count += 1
-                except Exception as e:
-                    logger.warning("{0} Could not save DKIM auth_result"
-                            " '{1}' for record '{2}': {3}"
-                            .format(log_prefix, dkim_result_idx,
-                            record_idx, e))
+                results_dkim.append(result_dkim)
 
             # Create SPF authentication result objects
-            for spf_result_idx, node_spf_result in enumerate(
-                    node_auth_results.findall('spf')):
+            results_spf = []
+            for node_spf_result in node_auth_results.findall('spf'):
                 result_spf = AuthResultSPF()
-                result_spf.record = record
-                result_spf.domain = node_spf_result.findtext('domain')
+                domain_fields.append((result_spf, "domain_id",
+                        node_spf_result.findtext('domain')))
                 # Field not in https://dmarc.org/dmarc-xml/0.1/rua.xsd
-                result_spf.scope = choices._string_to_numeric(
-                        choices.SPF_SCOPE, node_spf_result.findtext('scope'))
-                result_spf.result = choices._string_to_numeric(
-                        choices.SPF_RESULT, node_spf_result.findtext('result'))
+                result_spf.scope = _to_numeric(choices.SPF_SCOPE_NUMERIC,
+                        node_spf_result, 'scope')
+                result_spf.result = _to_numeric(choices.SPF_RESULT_NUMERIC,
+                        node_spf_result, 'result')
+                results_spf.append(result_spf)
 
-                try:
-                    result_spf.save()
-                except Exception as e:
-                    logger.warning("{0} Could not save SPF auth_result"
-                            " '{1}' for record '{2}': {3}"
-                            .format(log_prefix, spf_result_idx,
-                            record_idx, e))
-
-            # Assign DKIM results counter to report and re-save
-            try:
-                record.auth_result_dkim_count = dkim_count
-                record.save()
-            except Exception as e:
-                logger.warning("{0} Could not save record {1}: {2}"
-                        .format(log_prefix, record_idx, e))
+            # DKIM result counter (performance boost for data analysis) is
+            # known up front, so that records only have to be written once
+            record.auth_result_dkim_count = len(results_dkim)
+
+            record_entries.append((record, reasons, results_dkim,
+                    results_spf))
+
+        domain_ids = _get_domain_ids([entry[2] for entry in domain_fields])
+        for obj, field_name, domain in domain_fields:
+            setattr(obj, field_name, domain_ids.get(domain))
+
+        _store_record_entries(record_entries)
+
+
+
+class _HashingFile(object):
+    """Read-only file-like wrapper that computes the hash (see
+    HASH_ALGORITHM) of all bytes read from the wrapped file object, and adds
+    the time spent reading and hashing to STATS. """
+
+    def __init__(self, file):
+        self.file = file
+        self.hasher = hashing.new(HASH_ALGORITHM)
+
+    def read(self, size=-1):
+        start = time.time()
+        data = self.file.read(size)
+        read = time.time()
+        self.hasher.update(data)
+        STATS["time_read"] += read - start
+        STATS["time_hash"] += time.time() - read
+        return data
+
+    def hexdigest(self):
+        return self.hasher.hexdigest()
+
+
+
+class _ClosingFile(object):
+    """File-like wrapper that closes the passed underlying objects (e.g. the
+    archive file a `GzipFile` or zip member reads from) in the passed order
+    after the wrapped file object, which doesn't close them itself. """
+
+    def __init__(self, file, *underlying):
+        self.file = file
+        self.underlying = underlying
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+    def __iter__(self):
+        return iter(self.file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        try:
+            self.file.close()
+
+        finally:
+            for obj in self.underlying:
+                obj.close()
+
+
+
+def _iterparse(hashing_file):
+    """Yield ("start" and "end") events and elements of the XML read from
+    passed `_HashingFile`, adding the time spent parsing XML, without the
+    time spent reading and hashing, to STATS. """
+    context = xml.etree.ElementTree.iterparse(hashing_file,
+            events=("start", "end"))
+    while True:
+        start = time.time()
+        measured_seconds = _measured_seconds()
+        try:
+            event_element = next(context)
+
+        except StopIteration:
+            return
+
+        finally:
+            STATS["time_xml_parse"] += (time.time() - start -
+                    _measured_seconds() + measured_seconds)
+
+        yield event_element
+
+
+
+def _measured_seconds():
+    """Return the time spent in all stages (see STAGES) but "db" so far. """
+    return sum(STATS["time_" + stage] for stage in STAGES if stage != "db")
+
+
+
+def _is_maildir(path):
+    """Return True if passed path is a Maildir directory. """
+    return all(os.path.isdir(os.path.join(path, subdir))
+            for subdir in ("cur", "new", "tmp"))
+
+
+
+def _extract_reports(path):
+    """Yield a tuple of name and file opener (a function that returns a new
+    readable file object) for each DMARC aggregate report contained in the
+    file or Maildir directory at passed path. Supported are
+
+      - plain reports (*.xml),
+      - gzip compressed reports (*.gz),
+      - zip archives containing reports (*.zip),
+      - e-mail messages with such attachments (*.eml),
+      - mbox files with such e-mail messages (*.mbox),
+      - Maildir directories with such e-mail messages.
+
+    Reports are read from the archives and e-mails without writing temporary
+    files. Other files yield no reports. """
+
+    if os.path.isdir(path):
+        maildir = mailbox.Maildir(path, factory=None, create=False)
+        for key in maildir.iterkeys():
+            for report in _extract_message_reports(
+                    os.path.join(path, key), maildir.get_message(key)):
+                yield report
+
+    elif path.lower().endswith(".mbox"):
+        mbox = mailbox.mbox(path, factory=None, create=False)
+        for key in mbox.iterkeys():
+            for report in _extract_message_reports(
+                    "{0}/{1}".format(path, key), mbox.get_message(key)):
+                yield report
+
+    else:
+        for report in _extract_file_reports(path,
+                lambda: open(path, "rb")):
+            yield report
+
+
+
+def _extract_file_reports(name, open_file):
+    """Yield name and file opener for each DMARC aggregate report in the file
+    (or archive or e-mail) named `name` and read from the file object returned
+    by `open_file` (see `_extract_reports`). """
+    lower_name = name.lower()
+
+    if lower_name.endswith(".xml"):
+        yield name, open_file
+
+    elif lower_name.endswith(".gz"):
+        yield name, functools.partial(_open_gzip, open_file)
+
+    elif lower_name.endswith(".zip"):
+        with open_file() as file, zipfile.ZipFile(file) as zip_file:
+            member_names = [member.filename for member in
+                    zip_file.infolist() if not member.filename.endswith("/")]
+
+        for member_name in member_names:
+            for report in _extract_file_reports(
+                    "{0}/{1}".format(name, member_name),
+                    functools.partial(_open_zip_member, open_file,
+                    member_name)):
+                yield report
+
+    elif lower_name.endswith(".eml"):
+        with open_file() as file:
+            message = email.message_from_file(file)
+
+        for report in _extract_message_reports(name, message):
+            yield report
+
+
+
+def _extract_message_reports(name, message):
+    """Yield name and file opener for each DMARC aggregate report attached to
+    the e-mail message named `name` (see `_extract_reports`). """
+    for part in message.walk():
+        file_name = part.get_filename()
+        payload = part.get_payload(decode=True)
+        if not file_name or payload is None:
+            continue
+
+        for report in _extract_file_reports("{0}/{1}".format(name, file_name),
+                functools.partial(io.BytesIO, payload)):
+            yield report
+
+
+
+def _open_gzip(open_gzip_file):
+    """Return readable file object for the decompressed contents of the gzip
+    file read from the file object returned by `open_gzip_file`, which closes
+    that file object too (see `_ClosingFile`). """
+    file = open_gzip_file()
+    try:
+        return _ClosingFile(gzip.GzipFile(fileobj=file), file)
+
+    except Exception:
+        file.close()
+        raise
+
+
+
+def _open_zip_member(open_zip_file, member_name):
+    """Return readable file object for member of the zip archive read from
+    the file object returned by `open_zip_file`, which closes the archive
+    and that file object too (see `_ClosingFile`). """
+    file = open_zip_file()
+    try:
+        zip_file = zipfile.ZipFile(file)
+        return _ClosingFile(zip_file.open(member_name), zip_file, file)
+
+    except Exception:
+        file.close()
+        raise
+
+
+
+def _stop(signum, frame):
+    """Signal handler to stop watching directories (see `Command.watch`). """
+    logger.info("Received signal {}, stopping after the reports in"
+            " progress".format(signum))
+    STOP.set()
+
+
+
+def _is_watched_dir(path):
+    """Return True if files in the directory at passed path should be parsed
+    when watching directories, i.e. if it is neither ARCHIVE_DIR, FAILED_DIR
+    nor a Maildir directory. """
+    return (os.path.abspath(path) not in (ARCHIVE_DIR, FAILED_DIR) and
+            not _is_maildir(path))
+
+
+
+def _queue_file(file_queue, path):
+    """Add passed path to passed queue, waiting for a free slot until STOP is
+    set. Returns False if STOP is set. """
+    while not STOP.is_set():
+        try:
+            file_queue.put(path, timeout=1)
+            return True
+
+        except Queue.Full:
+            continue
+
+    return False
+
+
+
+def _watch_inotify(dirs, file_queue):
+    """Add paths of the files in passed directories and their subdirectories
+    (see `_is_watched_dir`) to passed queue, first of existing files and then
+    of files written or moved into them, as reported by inotify, until STOP
+    is set. """
+    inotify = inotify_simple.INotify()
+    flags = inotify_simple.flags
+    watch_mask = flags.CLOSE_WRITE | flags.MOVED_TO | flags.CREATE
+    watched_dirs = {}
+
+    def watch_dir(dir_path):
+        # Watch the directory before listing it, to not miss new files
+        watched_dirs[inotify.add_watch(dir_path, watch_mask)] = dir_path
+        for name in sorted(os.listdir(dir_path)):
+            path = os.path.join(dir_path, name)
+            if os.path.isdir(path):
+                if _is_watched_dir(path):
+                    watch_dir(path)
+
+            elif not _queue_file(file_queue, path):
+                return
+
+    try:
+        for dir_path in dirs:
+            watch_dir(dir_path)
+
+        while not STOP.is_set():
+            for event in inotify.read(timeout=1000):
+                if event.wd not in watched_dirs or not event.name:
+                    continue
+
+                path = os.path.join(watched_dirs[event.wd], event.name)
+                if event.mask & flags.ISDIR:
+                    if (event.mask & (flags.CREATE | flags.MOVED_TO) and
+                            _is_watched_dir(path)):
+                        watch_dir(path)
+
+                # Files are complete once they are closed or moved in
+                elif event.mask & (flags.CLOSE_WRITE | flags.MOVED_TO):
+                    _queue_file(file_queue, path)
+
+    except Exception as e:
+        logger.error("Could not watch directories: {}".format(e))
+        STOP.set()
+
+    finally:
+        inotify.close()
+
+
+
+def _watch_poll(dirs, file_queue):
+    """Add paths of the files in passed directories and their subdirectories
+    (see `_is_watched_dir`) to passed queue by listing them every
+    POLL_INTERVAL seconds, until STOP is set. Files are queued once their
+    size and modification time are the same in two listings, i.e. once they
+    are completely written, and again if they change. """
+    previous_stats = {}
+    queued_stats = {}
+
+    while not STOP.is_set():
+        current_stats = {}
+        for dir_path in dirs:
+            for root, subdirs, files in os.walk(dir_path):
+                subdirs[:] = [subdir for subdir in sorted(subdirs)
+                        if _is_watched_dir(os.path.join(root, subdir))]
+
+                for name in sorted(files):
+                    path = os.path.join(root, name)
+                    try:
+                        file_stat = os.stat(path)
+                    except OSError:
+                        continue
+
+                    current_stats[path] = (file_stat.st_size,
+                            file_stat.st_mtime)
+                    if (previous_stats.get(path) == current_stats[path] and
+                            queued_stats.get(path) != current_stats[path]):
+                        if not _queue_file(file_queue, path):
+                            return
+                        queued_stats[path] = current_stats[path]
+
+        # Forget files that are gone, e.g. moved to the archive
+        queued_stats = {path: queued_stats[path] for path in queued_stats
+                if path in current_stats}
+        previous_stats = current_stats
+
+        STOP.wait(POLL_INTERVAL)
+
+
+
+def _move(path, dir_path):
+    """Move the file at passed path to passed directory, adding a counter to
+    its name if the directory already contains a file with the same name.
+    Returns the absolute path of the moved file. """
+    name = os.path.basename(path)
+    root, ext = os.path.splitext(name)
+    target_path = os.path.join(dir_path, name)
+    cnt = 0
+    while os.path.exists(target_path):
+        cnt += 1
+        target_path = os.path.join(dir_path, "{0}.{1}{2}".format(root, cnt,
+                ext))
+
+    shutil.move(path, target_path)
+    return os.path.abspath(target_path)
+
+
+
+def _iter_pending(tasks, pending):
+    """Yield passed tasks, acquiring passed semaphore before taking each
+    task, which is released once the task's result came back (see
+    `_iter_pool_results`). Runs in the task handler thread of
+    `multiprocessing.Pool`. """
+    pending.acquire()
+    for task in tasks:
+        yield task
+        pending.acquire()
+
+
+
+def _iter_pool_results(results, pending):
+    """Yield results of passed `multiprocessing.Pool.imap_unordered`
+    iterator, releasing passed semaphore for each (see `_iter_pending`).
+    Waits for each result with a timeout, because Python 2 does not handle
+    signals while waiting without one (see `_stop`). """
+    while True:
+        try:
+            result = results.next(timeout=1)
+
+        except multiprocessing.TimeoutError:
+            continue
+
+        except StopIteration:
+            return
+
+        pending.release()
+        yield result
+
+
+
+def _init_worker():
+    """Initializes a parser worker process with its own GeoIP reader and
+    lookup cache. The db connection and GeoLite2 db are opened on first use.
+    Workers ignore SIGTERM and SIGINT, so that they finish the reports in
+    progress when the parent process stops (see `_stop`).
+    """
+    global geoip_lookup
+    geoip_lookup = geoip.CountryLookup(geoip_lookup.path, geoip_lookup.mode,
+            geoip_lookup.cache_size, geoip_lookup.prefix)
+
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, signal.SIG_IGN)
+
+
+
+def _parse_task(task):
+    """Parses the report file of a task tuple (path, report type, univie
+    flag), using the task's options. Returns a tuple of path, outcomes (see
+    `Command.parse`), the file's `os.stat` result before parsing it (or None
+    for Maildir directories) and a dict of counters for the run summary.
+    Module-level function, so that it can be passed to worker processes. """
+    global REPORT_TYPE
+    global UNIVIE
+
+    path, REPORT_TYPE, UNIVIE = task
+    geoip_hits, geoip_misses = geoip_lookup.hits, geoip_lookup.misses
+    STATS.clear()
+    UNKNOWN_VALUES.clear()
+    file_stat = os.stat(path) if os.path.isfile(path) else None
+    outcomes = Command().parse(path, file_stat)
+
+    return path, outcomes, file_stat, dict(STATS,
+            geoip_hits=geoip_lookup.hits - geoip_hits,
+            geoip_misses=geoip_lookup.misses - geoip_misses,
+            unknown_values=dict(UNKNOWN_VALUES))
+
+
+
+def _to_numeric(numeric_dict, parent_element, tag):
+    """Return numeric value (see `website.choices`) for the text of the
+    passed element's child element with passed tag, looked up
+    case-insensitively in passed dictionary, or None if there is no such text.
+    Unknown values are counted in UNKNOWN_VALUES and None is returned. """
+    value = parent_element.findtext(tag)
+    if not value:
+        return None
+
+    try:
+        return numeric_dict[value.strip().lower()]
+
+    except KeyError:
+        UNKNOWN_VALUES["{0}/{1}".format(parent_element.tag, tag), value] += 1
+        return None
+
+
+
+def _prescan():
+    """Load the hashes of all stored reports into KNOWN_HASHES, the ids of
+    all stored reporters, keyed by their identity, into KNOWN_REPORTERS, the
+    ids of all stored domains, keyed by their name, into KNOWN_DOMAINS, the
+    sizes and modification times of all parsed files, keyed by their path,
+    into KNOWN_FILES and the paths of the failure ledger into KNOWN_FAILED.
+    """
+    global KNOWN_HASHES
+    global KNOWN_REPORTERS
+    global KNOWN_DOMAINS
+    global KNOWN_FILES
+    global KNOWN_FAILED
+
+    KNOWN_HASHES = set(Report.objects.exclude(report_hash=None)
+            .values_list("report_hash", flat=True).iterator())
+
+    # Iterate newest first, so that the oldest of equal reporters is kept
+    # (see `_get_reporter_id`)
+    KNOWN_REPORTERS = {}
+    for reporter_id, org_name, email, extra_contact_info in (
+            Reporter.objects.order_by("-id").values_list("id", "org_name",
+            "email", "extra_contact_info").iterator()):
+        KNOWN_REPORTERS[(org_name, email, extra_contact_info)] = reporter_id
+
+    KNOWN_DOMAINS = dict(Domain.objects.values_list("name", "id").iterator())
+
+    KNOWN_FILES = {path: (size, mtime) for path, size, mtime in
+            ParsedFile.objects.values_list("path", "size", "mtime")
+            .iterator()}
+
+    KNOWN_FAILED = set(FailedReport.objects.values_list("path", flat=True)
+            .iterator())
+
+    logger.info("Found {0} stored reports from {1} reporters, {2} domains,"
+            " {3} parsed files and {4} failed files".format(len(KNOWN_HASHES),
+            len(KNOWN_REPORTERS), len(KNOWN_DOMAINS), len(KNOWN_FILES),
+            len(KNOWN_FAILED)))
+
+
+
+def _is_stored_report(file_hash):
+    """Return True if a report with passed hash is stored, looking it up in
+    KNOWN_HASHES if available and in the db otherwise. """
+    if KNOWN_HASHES is not None:
+        return file_hash in KNOWN_HASHES
+
+    return Report.objects.filter(report_hash=file_hash).exists()
+
+
+
+def _add_stored_report(file_hash):
+    """Add hash of a committed report to KNOWN_HASHES if available. """
+    if KNOWN_HASHES is not None:
+        KNOWN_HASHES.add(file_hash)
+
+
+
+def _is_parsed_file(path, file_stat):
+    """Return True if the file at passed path was parsed with the size and
+    modification time of passed `os.stat` result, looking it up in
+    KNOWN_FILES if available and in the db otherwise. """
+    path = os.path.abspath(path)
+    if KNOWN_FILES is not None:
+        return KNOWN_FILES.get(path) == (file_stat.st_size,
+                file_stat.st_mtime)
+
+    return ParsedFile.objects.filter(path=path, size=file_stat.st_size,
+            mtime=file_stat.st_mtime).exists()
+
+
+
+def _add_parsed_file(path, file_stat):
+    """Add size and modification time of passed `os.stat` result for the
+    parsed file at passed path to PARSED_FILES, which are stored with the
+    next batch (see `_store_parsed_files`). """
+    PARSED_FILES[os.path.abspath(path)] = (file_stat.st_size,
+            file_stat.st_mtime)
+
+
+
+def _store_parsed_files():
+    """Store the sizes and modification times of PARSED_FILES, replacing
+    stored ones of the same paths, add them to KNOWN_FILES if available and
+    empty PARSED_FILES. Deletes at most 500 paths at once (SQLite limits the
+    number of query parameters). """
+    if not PARSED_FILES:
+        return
+
+    paths = list(PARSED_FILES)
+    try:
+        with transaction.atomic():
+            for idx in range(0, len(paths), 500):
+                ParsedFile.objects.filter(
+                        path__in=paths[idx:idx + 500]).delete()
+
+            _bulk_create(ParsedFile, [ParsedFile(path=path, size=size,
+                    mtime=mtime) for path, (size, mtime) in
+                    PARSED_FILES.items()])
+
+    except Exception as e:
+        logger.error("Could not store size and modification time of {0}"
+                " parsed files: {1}".format(len(paths), e))
+
+    else:
+        if KNOWN_FILES is not None:
+            KNOWN_FILES.update(PARSED_FILES)
+
+    PARSED_FILES.clear()
+
+
+
+def _add_failed_report(path):
+    """Add path of a file in the failure ledger to KNOWN_FAILED if available.
+    """
+    if KNOWN_FAILED is not None:
+        KNOWN_FAILED.add(os.path.abspath(path))
+
+
+
+def _remove_failed_report(path):
+    """Remove file at passed path from the failure ledger. If KNOWN_FAILED is
+    available, only paths in KNOWN_FAILED are removed (and from KNOWN_FAILED
+    too), so that the db is not queried for files that never failed. """
+    path = os.path.abspath(path)
+    if KNOWN_FAILED is not None:
+        if path not in KNOWN_FAILED:
+            return
+
+        KNOWN_FAILED.remove(path)
+
+    FailedReport.objects.filter(path=path).delete()
+
+
+
+def _get_reporter_id(org_name, email, extra_contact_info, prescanned=True):
+    """Return id of the oldest reporter with passed identity, or None. Looks
+    the reporter up in KNOWN_REPORTERS if available and `prescanned` is True,
+    and in the db otherwise. """
+    key = (org_name, email, extra_contact_info)
+    if prescanned and KNOWN_REPORTERS is not None:
+        return KNOWN_REPORTERS.get(key)
+
+    reporter_id = Reporter.objects.filter(org_name=org_name, email=email,
+            extra_contact_info=extra_contact_info).order_by("id").values_list(
+            "id", flat=True).first()
+
+    # Reporters found in the db are committed and can be remembered
+    if reporter_id and KNOWN_REPORTERS is not None:
+        KNOWN_REPORTERS[key] = reporter_id
+
+    return reporter_id
+
+
+
+def _create_reporter(org_name, email, extra_contact_info):
+    """Store reporter with passed identity to db, unless it is stored
+    already, and return its id. Must be called inside a transaction.
+
+    Parallel parser processes must not store the same new reporter twice. The
+    reporter is inserted in a savepoint, which is rolled back if the unique
+    constraint on reporters (see `website.apps` for reporters without
+    `extra_contact_info`) is violated, i.e. if another process stored the
+    reporter meanwhile (the insert waits until the other process commits).
+    The other process' reporter is then looked up in the db. """
+    # KNOWN_REPORTERS may be outdated, e.g. if another run stored the
+    # reporter after our prescan
+    if KNOWN_REPORTERS is not None:
+        reporter_id = _get_reporter_id(org_name, email, extra_contact_info,
+                prescanned=False)
+        if reporter_id:
+            return reporter_id
+
+    try:
+        with transaction.atomic():
+            reporter_id = Reporter.objects.create(org_name=org_name,
+                    email=email, extra_contact_info=extra_contact_info).id
+
+    except IntegrityError:
+        reporter_id = _get_reporter_id(org_name, email, extra_contact_info,
+                prescanned=False)
+        # The conflicting reporter must be committed by now
+        if not reporter_id:
+            raise
+
+        return reporter_id
+
+    # Only remember the reporter if it is actually committed
+    if KNOWN_REPORTERS is not None:
+        transaction.on_commit(functools.partial(KNOWN_REPORTERS.__setitem__,
+                (org_name, email, extra_contact_info), reporter_id))
+
+    return reporter_id
+
+
+
+def _get_domain_ids(names):
+    """Return dictionary of passed domain names and the ids of the
+    corresponding domains, storing new domains to db. Looks domains up in
+    KNOWN_DOMAINS if available and in the db otherwise. None is not a domain
+    name and is left out. Must be called inside a transaction. """
+    names = set(names)
+    names.discard(None)
+
+    domain_ids = {}
+    if KNOWN_DOMAINS is not None:
+        domain_ids = {name: KNOWN_DOMAINS[name] for name in names
+                if name in KNOWN_DOMAINS}
+
+    unknown_names = names - set(domain_ids)
+    if unknown_names:
+        domain_ids.update(_query_domain_ids(unknown_names))
+
+    new_names = names - set(domain_ids)
+    if new_names:
+        domain_ids.update(_create_domains(new_names))
+
+    # Domains of this transaction might not be committed yet, so we only
+    # remember them once they are
+    if unknown_names and KNOWN_DOMAINS is not None:
+        transaction.on_commit(functools.partial(KNOWN_DOMAINS.update, {
+                name: domain_ids[name] for name in unknown_names}))
+
+    return domain_ids
+
+
+
+def _query_domain_ids(names):
+    """Return dictionary of those of passed domain names that are stored in
+    the db and their ids, querying at most 500 names at once (SQLite limits
+    the number of query parameters). """
+    names = list(names)
+    domain_ids = {}
+    for idx in range(0, len(names), 500):
+        domain_ids.update(Domain.objects.filter(
+                name__in=names[idx:idx + 500]).values_list("name", "id"))
+
+    return domain_ids
+
+
+
+def _create_domains(names):
+    """Store domains with passed names to db and return dictionary of passed
+    names and the ids of the corresponding domains. Must be called inside a
+    transaction.
+
+    Parallel parser processes must not store the same new domain twice. The
+    domains are inserted in a savepoint, which is rolled back if the unique
+    constraint on domain names is violated, i.e. if another process stored
+    one of the names meanwhile (the insert waits until the other process
+    commits). Domains of such names are then looked up in the db and only
+    the remaining names are inserted again. Names are inserted in sorted
+    order, so that processes inserting overlapping names wait for each other
+    in the same order. """
+    names = set(names)
+    domain_ids = {}
+    while names:
+        try:
+            with transaction.atomic():
+                _bulk_create(Domain, [Domain(name=name)
+                        for name in sorted(names)])
+
+        except IntegrityError:
+            stored_domain_ids = _query_domain_ids(names)
+            # The conflicting domains must be committed by now
+            if not stored_domain_ids:
+                raise
+
+            domain_ids.update(stored_domain_ids)
+            names -= set(stored_domain_ids)
+
+        else:
+            domain_ids.update(_query_domain_ids(names))
+            break
+
+    return domain_ids
+
+
+
+def _store_record_entries(record_entries):
+    """Store records and their related objects to db, passed as list of
+    tuples of an unsaved record (with its report, domains and DKIM result
+    count assigned) and lists of its unsaved policy override reasons, DKIM
+    and SPF authentication results. Also creates and stores the records'
+    facts and rollups for analysis views (see `RecordFact` and
+    `RecordRollup`). Used by the parser and `python manage.py restore`. """
+    # Store records to db
+    records = [entry[0] for entry in record_entries]
+    _bulk_create_records(records)
+
+    # Now that the records have primary keys, assign them to the related
+    # objects, create the records' facts and rollups and store those to db,
+    # one bulk insert per table
+    reasons = []
+    results_dkim = []
+    results_spf = []
+    facts = []
+    for record, record_reasons, record_results_dkim, record_results_spf \
+            in record_entries:
+        for obj in record_reasons + record_results_dkim + record_results_spf:
+            obj.record = record
+
+        reasons += record_reasons
+        results_dkim += record_results_dkim
+        results_spf += record_results_spf
+        facts.append(RecordFact.fromRecord(record, record_results_dkim,
+                record_results_spf))
+
+    for model, objs in ((PolicyOverrideReason, reasons),
+            (AuthResultDKIM, results_dkim), (AuthResultSPF, results_spf),
+            (RecordFact, facts),
+            (RecordRollup, RecordRollup.fromRecords(records))):
+        _bulk_create(model, objs)
+
+
+
+def _bulk_create_records(records):
+    """Store passed records to db using as few INSERT statements as possible.
+
+    Related objects need the primary keys of their records, which Django's
+    `bulk_create` only sets on db backends that can return ids from bulk
+    inserts (i.e. PostgreSQL). On other backends records are saved one by one.
+    """
+    if connection.features.can_return_ids_from_bulk_insert:
+        _bulk_create(Record, records)
+
+    else:
+        for record in records:
+            record.save()
+
+
+
+def _bulk_create(model, objs):
+    """Store passed objects of passed model to db with bulk inserts of at most
+    BATCH_SIZE objects, or less if the db backend limits the number of query
+    parameters (e.g. SQLite). Unlike later versions, Django 1.11 does not
+    lower a passed `batch_size` to the backend's limit. """
+    batch_size = min(BATCH_SIZE, max(connection.ops.bulk_batch_size(
+            model._meta.concrete_fields, objs), 1))
+    model.objects.bulk_create(objs, batch_size=batch_size)
@@ -0,0 +1,95 @@
+"""
+<Program Name>
+    purge.py
+
+<Author>
+    Lukas Puehringer <luk.puehringer@gmail.com>
+
+<Started>
+    October, 2026
+
+<Copyright>
+    See LICENSE for licensing information.
+
+<Purpose>
+    Django management command to delete stored reports that begin before a
+    given date, optionally only incoming or outgoing reports, in batches with
+    set-based deletes (see `website.retention`).
+
+    Optionally, the reports are written to an archive file before they are
+    deleted, as newline delimited JSON, which is gzip compressed if the file
+    name ends with ".gz". Archived reports can be re-imported with
+    `python manage.py restore`.
+
+<Usage>
+    ```
+    python manage.py purge --before <YYYY-MM-DD> [--type (in|out)] \
+      [--archive <path>[.gz]]
+    ```
+"""
+
+import os
+import datetime
+import logging
+
+import pytz
+from django.core.management.base import BaseCommand, CommandError
+
+from website import choices, retention
+from website.models import Report
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = "Delete (and optionally archive) reports before a given date"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--before", dest="before", required=True,
+                help="Delete reports that begin before this date (YYYY-MM-DD,"
+                " UTC)")
+
+        parser.add_argument("--type", dest="type", default=None,
+                choices=("in", "out"), help=("Only delete incoming (in) or"
+                " outgoing (out) reports (default both)"))
+
+        parser.add_argument("--archive", dest="archive", default=None,
+                help=("Write deleted reports to this new file, gzip"
+                " compressed if it ends with '.gz'"))
+
+    def handle(self, *args, **options):
+        try:
+            before = datetime.datetime.strptime(options["before"],
+                    "%Y-%m-%d").replace(tzinfo=pytz.utc)
+
+        except ValueError:
+            raise CommandError("--before must be a date in the format"
+                    " YYYY-MM-DD, got '{}'.".format(options["before"]))
+
+        reports = Report.objects.filter(date_range_begin__lt=before)
+        if options["type"] == "in":
+            reports = reports.filter(report_type=choices.INCOMING)
+
+        elif options["type"] == "out":
+            reports = reports.filter(report_type=choices.OUTGOING)
+
+        if options["archive"] is None:
+            report_cnt = retention.delete_reports(reports)
+
+        else:
+            # Never overwrite an archive of previously deleted reports
+            if os.path.exists(options["archive"]):
+                raise CommandError("Archive '{}' already exists.".format(
+                        options["archive"]))
+
+            with retention.open_archive(options["archive"]) as archive_file:
+                report_cnt = retention.delete_reports(reports, archive_file)
+
+            logger.info("Archived deleted reports to '{}'".format(
+                    options["archive"]))
+
+        if report_cnt:
+            Report.cacheOverviewSummaries()
+
+        logger.info("Deleted {0} reports that begin before {1:%Y-%m-%d}"
+                .format(report_cnt, before))
@@ -0,0 +1,123 @@
+"""
+<Program Name>
+    queryplans.py
+
+<Author>
+    Lukas Puehringer <luk.puehringer@gmail.com>
+
+<Started>
+    October, 2026
+
+<Copyright>
+    See LICENSE for licensing information.
+
+<Purpose>
+    Django management command to print the db query plans of the queries that
+    analysis views and the filter form's dynamic choices perform, i.e. the
+    table records of each view, the message count per day and per country of
+    the filter sets of each view (one query per count model, see
+    `website.models.ViewPlan.getMessageCountQuerySets`), and the reporters,
+    reportees, DKIM and SPF domains that contain a query string, and the
+    source IPs that start with it.
+
+    Use it to check that the db uses the indexes defined in
+    `website.models` (and trigram and GiST indexes on PostgreSQL, see
+    `website.apps`), e.g. by comparing the plans before and after migrating.
+
+<Usage>
+    ```
+    python manage.py queryplans [--view <id>] [--query-str <string>] \
+      [--analyze]
+    ```
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models.functions import TruncDay
+
+from website import choices
+from website.models import View
+from website.views import get_choices
+
+CHOICE_TYPES = ("reporter", "reportee", "dkim_domain", "spf_domain",
+        "source_ip")
+
+class Command(BaseCommand):
+    help = "Print db query plans of analysis view and filter choice queries"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--view", dest="view", default=None, type=int,
+                help="Only print query plans for the view with this id")
+
+        parser.add_argument("--query-str", dest="query_str",
+                default="example", help=("String to query dynamic filter"
+                " choices with (default 'example')"))
+
+        parser.add_argument("--analyze", dest="analyze", default=False,
+                action="store_true", help=("Execute the queries and show"
+                " actual row counts and timings (PostgreSQL only)"))
+
+    def handle(self, *args, **options):
+        if options["analyze"] and connection.vendor != "postgresql":
+            raise CommandError("--analyze is only supported on PostgreSQL.")
+
+        views = View.objects.filter(enabled=True)
+        if options["view"] is not None:
+            views = View.objects.filter(pk=options["view"])
+            if not views:
+                raise CommandError("View {} does not exist.".format(
+                        options["view"]))
+
+        for view in views:
+            self.explain("View '{}': table records".format(view.title),
+                    view.getTableRecords(), options["analyze"])
+
+            plan = view.getPlan()
+            for group, query_sets in (
+                    ("day", plan.getMessageCountQuerySets("date",
+                            date=TruncDay("date_range_begin"))),
+                    ("country", plan.getMessageCountQuerySets(
+                            "country_iso_code"))):
+                for indexes, query_set in query_sets:
+                    self.explain("View '{0}', filter sets {1}: message count"
+                            " per {2}".format(view.title, ", ".join(
+                            "'{}'".format(plan.filter_sets[idx].label)
+                            for idx in indexes), group), query_set,
+                            options["analyze"])
+
+        if options["view"] is None:
+            for choice_type in CHOICE_TYPES:
+                self.explain("Choices '{0}' containing '{1}'".format(
+                        choice_type, options["query_str"]),
+                        get_choices(choice_type, choices.INCOMING,
+                        options["query_str"]), options["analyze"])
+
+    def explain(self, title, queryset, analyze):
+        """Print passed title and the db's query plan for passed query set.
+        """
+        sql, params = queryset.query.sql_with_params()
+
+        if connection.vendor == "sqlite":
+            explain_sql = "EXPLAIN QUERY PLAN "
+
+        elif analyze:
+            explain_sql = "EXPLAIN ANALYZE "
+
+        else:
+            explain_sql = "EXPLAIN "
+
+        with connection.cursor() as cursor:
+            cursor.execute(explain_sql + sql, params)
+            rows = cursor.fetchall()
+
+        self.stdout.write(title)
+        for row in rows:
+            # SQLite returns the plan's description in the last column
+            if connection.vendor == "sqlite":
+                self.stdout.write("  " + row[-1])
+
+            else:
+                self.stdout.write("  " + " | ".join(
+                        "{}".format(column) for column in row))
+
+        self.stdout.write("")
@@ -0,0 +1,97 @@
+"""
+<Program Name>
+    rebuild.py
+
+<Author>
+    Lukas Puehringer <luk.puehringer@gmail.com>
+
+<Started>
+    October, 2026
+
+<Copyright>
+    See LICENSE for licensing information.
+
+<Purpose>
+    Django management command to rebuild the record facts and rollups (see
+    `website.models.RecordFact` and `website.models.RecordRollup`), which
+    analysis views query, from stored reports, e.g. to backfill them for
+    reports that were stored before facts and rollups existed.
+
+    The parser maintains facts and rollups for the reports it stores, so that
+    there is no need to run this command after parsing reports.
+
+<Usage>
+    ```
+    python manage.py rebuild [--batch-size <number>]
+    ```
+"""
+
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from website.models import Report, Record, RecordFact, RecordRollup
+from website.management.commands import parse
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = ("Rebuild record facts and rollups for analysis views from stored"
+            " reports")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", dest="batch_size",
+                default=parse.BATCH_SIZE, type=int, help=("Number of"
+                " records to read and facts to write at once (default"
+                " {})".format(parse.BATCH_SIZE)))
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be a positive number.")
+
+        # `parse._bulk_create` inserts at most parse.BATCH_SIZE objects at once
+        parse.BATCH_SIZE = options["batch_size"]
+
+        # Analysis views show either the old or the rebuilt facts and rollups
+        with transaction.atomic():
+            RecordFact.objects.all().delete()
+            RecordRollup.objects.all().delete()
+            fact_cnt, rollup_cnt = self.rebuild(options["batch_size"])
+            Report.updateDataGeneration()
+
+        # The Overview page statistics are queried from rollups
+        Report.cacheOverviewSummaries()
+
+        logger.info("Rebuilt {0} record facts and {1} rollups".format(
+                fact_cnt, rollup_cnt))
+
+    def rebuild(self, batch_size):
+        """Create facts and rollups for all stored records, reading records
+        in batches of passed size ordered by id. Returns the number of created
+        facts and rollups. """
+        fact_cnt = 0
+        rollup_cnt = 0
+        last_id = 0
+        while True:
+            records = list(Record.objects.filter(id__gt=last_id).order_by(
+                    "id").select_related("report__reporter").prefetch_related(
+                    "authresultdkim_set", "authresultspf_set")[:batch_size])
+
+            if not records:
+                return fact_cnt, rollup_cnt
+
+            parse._bulk_create(RecordFact, [
+                RecordFact.fromRecord(record,
+                        list(record.authresultdkim_set.all()),
+                        list(record.authresultspf_set.all()))
+                    for record in records
+            ])
+
+            rollups = RecordRollup.fromRecords(records)
+            parse._bulk_create(RecordRollup, rollups)
+
+            fact_cnt += len(records)
+            rollup_cnt += len(rollups)
+            last_id = records[-1].id
+            logger.info("Rebuilt {} record facts so far".format(fact_cnt))
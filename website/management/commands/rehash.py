@@ -0,0 +1,97 @@
+"""
+<Program Name>
+    rehash.py
+
+<Author>
+    Lukas Puehringer <luk.puehringer@gmail.com>
+
+<Started>
+    October, 2026
+
+<Copyright>
+    See LICENSE for licensing information.
+
+<Purpose>
+    Django management command to convert the hashes of stored reports to
+    another hash algorithm (see `website.hashing`), e.g. when changing
+    `settings.REPORT_HASH_ALGORITHM` from "md5" to "blake2b".
+
+    Report hashes can't be converted without the report contents, hence the
+    command reads the original report files (in all formats supported by the
+    parser), computes both hashes and replaces the old hash of the matching
+    stored report with the new one. Reports whose files are not passed keep
+    their old hash and would not be recognized as already stored if they were
+    parsed again.
+
+<Usage>
+    ```
+    python manage.py rehash [--from <algorithm>] [--to <algorithm>] \
+      (<dmarc-aggregate-report> | <dir>) ...
+    ```
+"""
+
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+
+from website import hashing
+from website.models import Report
+from website.management.commands import parse
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = "Convert hashes of stored reports to another hash algorithm"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", nargs="+", type=str,
+                help="File or directory path(s) to the original DMARC"
+                " aggregate report(s)")
+
+        parser.add_argument("--from", dest="from_algorithm", default="md5",
+                help="Hash algorithm of the stored hashes (default md5)")
+
+        parser.add_argument("--to", dest="to_algorithm",
+                default=settings.REPORT_HASH_ALGORITHM, help=("Hash algorithm"
+                " to convert to (default {})".format(
+                settings.REPORT_HASH_ALGORITHM)))
+
+    def handle(self, *args, **options):
+        for algorithm in (options["from_algorithm"], options["to_algorithm"]):
+            try:
+                hashing.new(algorithm)
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        updated_cnt = 0
+        for path in options["path"]:
+            for file_name in parse.Command().walk(path):
+                try:
+                    updated_cnt += self.rehash(file_name,
+                            options["from_algorithm"],
+                            options["to_algorithm"])
+                except Exception as e:
+                    logger.error("Could not rehash reports in '{0}': {1}"
+                            .format(file_name, e))
+
+        logger.info("Converted {} report hashes".format(updated_cnt))
+
+    def rehash(self, path, from_algorithm, to_algorithm):
+        """Replace old hashes of the stored reports contained in the file or
+        Maildir directory at passed path with new hashes. Returns the number
+        of updated reports. """
+        updated_cnt = 0
+        for name, open_file in parse._extract_reports(path):
+            old_hasher = hashing.new(from_algorithm)
+            new_hasher = hashing.new(to_algorithm)
+            with open_file() as file:
+                for chunk in hashing.chunks(file):
+                    old_hasher.update(chunk)
+                    new_hasher.update(chunk)
+
+            updated_cnt += Report.objects.filter(
+                    report_hash=old_hasher.hexdigest()).update(
+                    report_hash=new_hasher.hexdigest())
+
+        return updated_cnt
@@ -0,0 +1,146 @@
+"""
+<Program Name>
+    restore.py
+
+<Author>
+    Lukas Puehringer <luk.puehringer@gmail.com>
+
+<Started>
+    October, 2026
+
+<Copyright>
+    See LICENSE for licensing information.
+
+<Purpose>
+    Django management command to re-import reports from archive files
+    written by `python manage.py purge --archive` (see `website.retention`
+    for the format). Archives whose file name ends with ".gz" are read gzip
+    compressed.
+
+    Like the parser, the command skips reports that are already stored (by
+    report hash) and stores each report in one transaction, together with
+    its record facts and rollups.
+
+<Usage>
+    ```
+    python manage.py restore <archive>[.gz] ...
+    ```
+"""
+
+import gzip
+import json
+import logging
+
+from dateutil import parser as date_parser
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from website.models import (Report, Reporter, ReportError, Record,
+        PolicyOverrideReason, AuthResultDKIM, AuthResultSPF)
+from website.management.commands import parse
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = "Re-import reports from archives written by 'purge --archive'"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", nargs="+", type=str,
+                help="Path(s) to report archive(s)")
+
+    def handle(self, *args, **options):
+        stored_cnt = 0
+        duplicate_cnt = 0
+        for path in options["path"]:
+            if path.endswith(".gz"):
+                archive_file = gzip.open(path, "rb")
+
+            else:
+                archive_file = open(path, "rb")
+
+            with archive_file:
+                for line_idx, line in enumerate(archive_file, 1):
+                    report_dict = json.loads(line)
+                    if (report_dict["report_hash"] is not None and
+                            Report.objects.filter(report_hash=report_dict[
+                            "report_hash"]).exists()):
+                        logger.debug("'{0}' line {1}: Report is already"
+                                " stored".format(path, line_idx))
+                        duplicate_cnt += 1
+                        continue
+
+                    with transaction.atomic():
+                        self.restore(report_dict)
+
+                    stored_cnt += 1
+
+        if stored_cnt:
+            Report.cacheOverviewSummaries()
+
+        logger.info("Restored {0} reports, skipped {1} already stored"
+                " reports".format(stored_cnt, duplicate_cnt))
+
+    def restore(self, report_dict):
+        """Store report and its related objects from passed dictionary as
+        created by `website.retention.report_to_dict`. Must be called inside
+        a transaction. """
+        reporter_dict = report_dict["reporter"]
+        reporter = Reporter.objects.filter(**reporter_dict).first()
+        if reporter is None:
+            reporter = Reporter.objects.create(**reporter_dict)
+
+        # Domain ids of all domain names in the report
+        domain_ids = parse._get_domain_ids([report_dict["domain"]] + [
+            record_dict[field] for record_dict in report_dict["records"]
+                for field in ("envelope_to", "envelope_from", "header_from")
+        ] + [
+            result["domain"] for record_dict in report_dict["records"]
+                for result in record_dict["auth_results_dkim"] +
+                        record_dict["auth_results_spf"]
+        ])
+
+        report = Report(reporter=reporter,
+                domain_id=domain_ids.get(report_dict["domain"]), **{
+            field: report_dict[field] for field in ("report_type",
+                    "report_hash", "report_id", "version", "adkim", "aspf",
+                    "p", "sp", "pct", "fo")
+        })
+        report.date_range_begin = date_parser.parse(
+                report_dict["date_range_begin"])
+        report.date_range_end = date_parser.parse(
+                report_dict["date_range_end"])
+        report.save()
+        Report.updateDataGeneration()
+
+        parse._bulk_create(ReportError, [
+            ReportError(report=report, error=error)
+                for error in report_dict["errors"]
+        ])
+
+        # See `parse._store_record_entries`
+        record_entries = []
+        for record_dict in report_dict["records"]:
+            record = Record(report=report, **{
+                field: record_dict[field] for field in ("source_ip",
+                        "country_iso_code", "count", "disposition", "dkim",
+                        "spf")
+            })
+            record.envelope_to_id = domain_ids.get(record_dict["envelope_to"])
+            record.envelope_from_id = domain_ids.get(
+                    record_dict["envelope_from"])
+            record.header_from_id = domain_ids.get(record_dict["header_from"])
+            record.auth_result_dkim_count = len(
+                    record_dict["auth_results_dkim"])
+
+            record_entries.append((record,
+                    [PolicyOverrideReason(**reason)
+                            for reason in record_dict["reasons"]],
+                    [AuthResultDKIM(domain_id=domain_ids.get(result["domain"]),
+                            result=result["result"],
+                            human_result=result["human_result"])
+                            for result in record_dict["auth_results_dkim"]],
+                    [AuthResultSPF(domain_id=domain_ids.get(result["domain"]),
+                            scope=result["scope"], result=result["result"])
+                            for result in record_dict["auth_results_spf"]]))
+
+        parse._store_record_entries(record_entries)
@@ -0,0 +1,133 @@
+"""
+<Program Name>
+    retention.py
+
+<Author>
+    Lukas Puehringer <luk.puehringer@gmail.com>
+
+<Started>
+    October, 2026
+
+<Copyright>
+    See LICENSE for licensing information.
+
+<Purpose>
+    Django management command to delete stored reports of months that are
+    older than the retention period, i.e. `settings.REPORT_RETENTION_MONTHS`
+    months before the current month, e.g. with a retention period of 12
+    months, running the command in any day of March 2027 deletes all reports
+    that begin before March 2026.
+
+    Reports are deleted month by month in batches, with set-based deletes
+    (see `website.retention`).
+
+    Optionally, the reports are written to an archive file before they are
+    deleted, as newline delimited JSON, which is gzip compressed if the file
+    name ends with ".gz" (see `python manage.py purge`). Archived reports can
+    be re-imported with `python manage.py restore`.
+
+<Usage>
+    ```
+    python manage.py retention [--months <number>] [--dry-run] \
+      [--archive <path>[.gz]]
+    ```
+"""
+
+import os
+import logging
+
+from dateutil.relativedelta import relativedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+
+from website import retention
+from website.models import Report
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = ("Delete (and optionally archive) stored reports older than the"
+            " retention period")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--months", dest="months", type=int,
+                default=settings.REPORT_RETENTION_MONTHS, help=("Number of"
+                " months to keep reports for (default"
+                " settings.REPORT_RETENTION_MONTHS, i.e. {})".format(
+                settings.REPORT_RETENTION_MONTHS)))
+
+        parser.add_argument("--dry-run", dest="dry_run", default=False,
+                action="store_true", help=("Only log the number of reports"
+                " per month that would be deleted"))
+
+        parser.add_argument("--archive", dest="archive", default=None,
+                help=("Write deleted reports to this new file, gzip"
+                " compressed if it ends with '.gz'"))
+
+    def handle(self, *args, **options):
+        if options["months"] is None:
+            raise CommandError("No retention period configured, set"
+                    " settings.REPORT_RETENTION_MONTHS or use --months.")
+
+        if options["months"] < 0:
+            raise CommandError("--months must not be negative.")
+
+        # Never overwrite an archive of previously deleted reports
+        if (options["archive"] is not None and
+                os.path.exists(options["archive"])):
+            raise CommandError("Archive '{}' already exists.".format(
+                    options["archive"]))
+
+        cutoff = retention.get_cutoff(options["months"])
+        oldest = Report.objects.order_by("date_range_begin").values_list(
+                "date_range_begin", flat=True).first()
+
+        if oldest is None or oldest >= cutoff:
+            logger.info("No reports begin before {:%Y-%m-%d}".format(cutoff))
+            return
+
+        if options["archive"] is None or options["dry_run"]:
+            report_cnt = self.expire(oldest, cutoff, options["dry_run"])
+
+        else:
+            # All months are archived to the same file
+            with retention.open_archive(options["archive"]) as archive_file:
+                report_cnt = self.expire(oldest, cutoff, False, archive_file)
+
+            logger.info("Archived deleted reports to '{}'".format(
+                    options["archive"]))
+
+        # Recompute the Overview page statistics once for all months
+        if report_cnt and not options["dry_run"]:
+            Report.cacheOverviewSummaries()
+
+        logger.info("{0} {1} reports that begin before {2:%Y-%m-%d}".format(
+                "Would delete" if options["dry_run"] else "Deleted",
+                report_cnt, cutoff))
+
+    def expire(self, oldest, cutoff, dry_run, archive_file=None):
+        """Delete (or with `dry_run` only count) reports that begin from the
+        month of passed oldest date up to passed cutoff date, month by month,
+        archiving them to passed archive file object, if any. Returns the
+        number of (would be) deleted reports. """
+        report_cnt = 0
+        for month in retention.iter_months(oldest, cutoff):
+            reports = Report.objects.filter(date_range_begin__gte=month,
+                    date_range_begin__lt=min(cutoff,
+                    month + relativedelta(months=1)))
+
+            if dry_run:
+                month_cnt = reports.count()
+
+            else:
+                month_cnt = retention.delete_reports(reports, archive_file)
+
+            if month_cnt:
+                logger.info("{0} {1} reports of {2:%Y-%m}".format(
+                        "Would delete" if dry_run else "Deleted",
+                        month_cnt, month))
+
+            report_cnt += month_cnt
+
+        return report_cnt
@@ -0,0 +1,145 @@
+"""
+<Program Name>
+    upgradedomains.py
+
+<Author>
+    Lukas Puehringer <luk.puehringer@gmail.com>
+
+<Started>
+    October, 2026
+
+<Copyright>
+    See LICENSE for licensing information.
+
+<Purpose>
+    Django management command to upgrade a database that stores domain names
+    as strings in reports, records and authentication results to the domain
+    dictionary (see `website.models.Domain`), which these columns reference
+    instead.
+
+    This repository ships no migrations, each installation creates its own
+    with `makemigrations`. The migration `makemigrations` creates for the
+    domain dictionary would change the type of the string columns to foreign
+    keys, which fails for stored domain names. Hence, this command writes a
+    migration to the website app's migrations, which creates the domain
+    table, fills it with the stored domain names and replaces the names in
+    the string columns with the ids of their domains. The migration that
+    `makemigrations` creates afterwards then only converts the columns
+    to foreign keys.
+
+    The migration also empties record facts and rollups, if they exist,
+    because they may contain domain names too. Rebuild them afterwards.
+
+<Usage>
+    ```
+    python manage.py upgradedomains
+    python manage.py makemigrations website
+    python manage.py migrate
+    python manage.py rebuild
+    ```
+"""
+
+import io
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import migrations
+from django.db.migrations.autodetector import MigrationAutodetector
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.state import ModelState
+from django.db.migrations.writer import MigrationWriter
+
+from website.models import Domain
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Tables and their columns that stored domain names as strings, before they
+# referenced the domain dictionary
+DOMAIN_COLUMNS = (
+    ("website_report", ("domain",)),
+    ("website_record", ("envelope_to", "envelope_from", "header_from")),
+    ("website_authresultdkim", ("domain",)),
+    ("website_authresultspf", ("domain",)),
+)
+
+# Tables derived from records, which may store domain names too (see
+# `python manage.py rebuild`)
+DERIVED_TABLES = ("website_recordfact", "website_recordrollup")
+
+class Command(BaseCommand):
+    help = ("Write a migration that converts stored domain names to the"
+            " domain dictionary, run it before makemigrations")
+
+    def handle(self, *args, **options):
+        loader = MigrationLoader(None, ignore_no_migrations=True)
+        leaf_nodes = loader.graph.leaf_nodes("website")
+
+        if not leaf_nodes:
+            raise CommandError("The website app has no migrations, i.e. there"
+                    " is no database to upgrade. Run makemigrations and"
+                    " migrate instead.")
+
+        if len(leaf_nodes) > 1:
+            raise CommandError("Conflicting migrations of the website app"
+                    " found, run makemigrations --merge first.")
+
+        if ("website", "domain") in loader.project_state().models:
+            raise CommandError("The website app's migrations already create"
+                    " the domain dictionary. If you ran makemigrations before"
+                    " this command, delete the new migration (if it isn't"
+                    " applied yet) and run this command again.")
+
+        number = MigrationAutodetector.parse_number(leaf_nodes[0][1]) or 0
+        migration = migrations.Migration(
+                "{0:04d}_domain_dictionary".format(number + 1), "website")
+        migration.dependencies = leaf_nodes
+
+        # Create the domain table like `makemigrations` would, which adds
+        # indexes with separate operations
+        model_state = ModelState.from_model(Domain)
+        model_state.options.pop("indexes", None)
+        migration.operations = [
+            migrations.CreateModel(name=model_state.name,
+                    fields=model_state.fields, options=model_state.options,
+                    bases=model_state.bases, managers=model_state.managers),
+            migrations.RunPython(convert_domains)
+        ]
+
+        writer = MigrationWriter(migration)
+        with io.open(writer.path, "w", encoding="utf-8") as migration_file:
+            migration_file.write(writer.as_string())
+
+        logger.info("Wrote migration '{}', now run makemigrations, migrate"
+                " and rebuild".format(writer.path))
+
+
+
+def convert_domains(apps, schema_editor):
+    """Migration function (see `Command`) to store the distinct domain names
+    of DOMAIN_COLUMNS to the domain table and replace them in these columns
+    with the ids of their domains (as strings), which the following migration
+    converts to foreign keys. Empties DERIVED_TABLES. """
+    connection = schema_editor.connection
+    quote = connection.ops.quote_name
+    domain_table = quote(apps.get_model("website", "Domain")._meta.db_table)
+
+    schema_editor.execute("INSERT INTO {0} ({1}) SELECT {1} FROM ({2})"
+            " names WHERE {1} IS NOT NULL".format(domain_table, quote("name"),
+            " UNION ".join("SELECT {0} AS {1} FROM {2}".format(quote(column),
+            quote("name"), quote(table)) for table, columns in DOMAIN_COLUMNS
+            for column in columns)))
+
+    # MySQL can't cast to VARCHAR
+    string_type = "CHAR" if connection.vendor == "mysql" else "VARCHAR"
+    for table, columns in DOMAIN_COLUMNS:
+        schema_editor.execute("UPDATE {0} SET {1}".format(quote(table),
+                ", ".join("{0} = (SELECT CAST({1}.{2} AS {3}) FROM {1} WHERE"
+                " {1}.{4} = {5}.{0})".format(quote(column), domain_table,
+                quote("id"), string_type, quote("name"), quote(table))
+                for column in columns)))
+
+    table_names = connection.introspection.table_names()
+    for table in DERIVED_TABLES:
+        if table in table_names:
+            schema_editor.execute("DELETE FROM {}".format(quote(table)))
@@ -36,19 +36,41 @@
     analysis view filters.
 
 """
+import collections
+import hashlib
+import json
+import uuid
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
 from django.db.models import Q
 
-from django.db import models
+from django.core.cache import cache
+from django.db import models, transaction
 from django.contrib.contenttypes.fields import (GenericForeignKey,
         GenericRelation)
 from django.db.models.fields.related import ForeignKey
-from django.db.models import Sum, Count, Max
+from django.db.models import Sum, Count, Max, Case, When, IntegerField
 from django.db.models.functions import TruncDay
 
 import choices
+import networks
 
+# Cache keys of the compiled plans (see `ViewPlan`) and revisions of views,
+# of the data of views (see `View.getDataCacheKey`), of the generation of
+# stored report data (see `Report.getDataGeneration`) and of the Overview
+# page statistics (see `Report.getCachedOverviewSummary`), which don't expire
+# but are replaced with each data generation
+# Change the key of plans if the format of `ViewPlan` changes
+PLAN_CACHE_KEY = "view_plan_{0}_{1}"
+REVISION_CACHE_KEY = "view_revision_{0}"
+DATA_CACHE_KEY = "view_data_{0}_{1}_{2}_{3}_{4}_{5}"
+DATA_GENERATION_CACHE_KEY = "data_generation"
+OVERVIEW_CACHE_KEY = "overview_summary_{0}_{1}"
+
+# Seconds after which cached plans and view data expire, e.g. those of old
+# view revisions or data generations
+PLAN_CACHE_TIMEOUT = 60 * 60 * 24
+DATA_CACHE_TIMEOUT = 60 * 60 * 24
 
 
 
@@ -57,6 +79,17 @@ import choices
 See https://tools.ietf.org/html/rfc7489#appendix-C for infos about the fields.
 
 """
+class Domain(models.Model):
+    """Dictionary of domain names, referenced by reports, records and
+    authentication results instead of storing the same few domain names over
+    and over again. """
+    name = models.CharField(max_length=100, unique=True)
+
+    def __unicode__(self):
+        return self.name
+
+
+
 class Reporter(models.Model):
     org_name = models.CharField(max_length=100)
     email = models.EmailField()
@@ -66,6 +99,12 @@ class Reporter(models.Model):
         return self.org_name
 
 
+    class Meta:
+        # Prevents concurrent parser processes from creating the same reporter,
+        # see `website.apps` for reporters without `extra_contact_info`
+        unique_together = ("org_name", "email", "extra_contact_info")
+
+
 
 class Report(models.Model):
     """In the schema a report is called feedback"""
@@ -73,8 +112,10 @@ class Report(models.Model):
     report_type = models.IntegerField(choices=choices.REPORT_TYPE)
     date_created = models.DateTimeField(auto_now=False, auto_now_add=True)
 
-    # MD5 hash to detect duplicate reports when parsing
-    report_hash = models.CharField(max_length = 32)
+    # MD5 hash to detect duplicate reports when parsing (unique to also detect
+    # duplicates stored concurrently by parallel parser processes). Only None
+    # while a report is being stored in streaming mode.
+    report_hash = models.CharField(max_length = 32, unique=True, null=True)
 
     # Meta data
     report_id = models.CharField(max_length=200)
@@ -85,7 +126,7 @@ class Report(models.Model):
     reporter = models.ForeignKey("Reporter")
 
     # Policy published
-    domain = models.CharField(max_length=100)
+    domain = models.ForeignKey("Domain")
     adkim = models.IntegerField(choices=choices.ALIGNMENT_MODE, null=True)
     aspf = models.IntegerField(choices=choices.ALIGNMENT_MODE, null=True)
     p = models.IntegerField(choices=choices.DISPOSITION_TYPE)
@@ -94,6 +135,18 @@ class Report(models.Model):
     fo = models.CharField(max_length=8, null=True)
 
 
+    class Meta:
+        # Analysis views always filter by report type and date range, the
+        # filter form's choices by report type and domain (see
+        # `queryplans` management command)
+        indexes = [
+            models.Index(fields=["report_type", "date_range_begin"],
+                    name="report_type_begin_idx"),
+            models.Index(fields=["report_type", "domain"],
+                    name="report_type_domain_idx")
+        ]
+
+
     @staticmethod
     def getOldestReportDate(report_type=choices.INCOMING):
         """Return the date for the oldest report in the database as
@@ -116,54 +169,118 @@ class Report(models.Model):
             return None
 
 
+    @staticmethod
+    def getDataGeneration():
+        """Return generation of the stored report data, i.e. a random token
+        that is replaced whenever reports are stored or deleted (see
+        `updateDataGeneration`). Generations are only stored in the cache,
+        a missing generation is created. See `View.getRevision`. """
+        generation = cache.get(DATA_GENERATION_CACHE_KEY)
+
+        if generation is None:
+            # Another process might create the generation at the same time
+            cache.add(DATA_GENERATION_CACHE_KEY, uuid.uuid4().hex, None)
+            generation = cache.get(DATA_GENERATION_CACHE_KEY)
+
+        return generation
+
+
+    @staticmethod
+    def updateDataGeneration():
+        """Replace generation of the stored report data (see
+        `getDataGeneration`) once the current transaction is committed, so
+        that cached data of analysis views is no longer used. Called by the
+        parser and other commands that store or delete reports. """
+        transaction.on_commit(lambda: cache.set(DATA_GENERATION_CACHE_KEY,
+                uuid.uuid4().hex, None))
+
+
     @staticmethod
     def getOverviewSummary(report_type=choices.INCOMING):
         """Return statistics about aligned DKIM and SPF results and disposition
         for all stored reports of a given report type.
 
         This method is used to display general infos for all reports on the
-        Overview page.
+        Overview page, see `getCachedOverviewSummary`.
         """
+        report_cnts = Report.objects.filter(report_type=report_type
+                ).aggregate(domain_cnt=Count("domain", distinct=True),
+                report_cnt=Count("id"))
+
+        # Query aggregated message counts per combination of dkim, spf and
+        # disposition result from record rollups at once, and sum them up per
+        # result of each in Python
+        message_cnt = None
+        message_cnts = {
+            "dkim": collections.Counter(),
+            "spf": collections.Counter(),
+            "disposition": collections.Counter()
+        }
+        for res in RecordRollup.objects.filter(report_type=report_type
+                ).values("dkim", "spf", "disposition").annotate(
+                cnt=Sum("count")).order_by():
+            message_cnt = (message_cnt or 0) + res["cnt"]
+            for field, cnts in message_cnts.iteritems():
+                cnts[res[field]] += res["cnt"]
+
+        # Transform result number to display name
         return {
-            "domain_cnt" : Report.objects.filter(
-                    report_type=report_type).values("domain").distinct().count(),
-            "report_cnt" : Report.objects.filter(
-                    report_type=report_type).count(),
-            "message_cnt" : Record.objects.filter(
-                    report__report_type=report_type).aggregate(
-                    cnt=Sum("count"))["cnt"],
-
-            # Query per result aggregated message count for dkim, spf and
-            # disposition and transform result number to display name
+            "domain_cnt" : report_cnts["domain_cnt"],
+            "report_cnt" : report_cnts["report_cnt"],
+            "message_cnt" : message_cnt,
             "dkim" : [
                 {
-                    "cnt": res["cnt"],
-                    "label": dict(choices.DMARC_RESULT).get(res["dkim"])
-                } for res in Record.objects.filter(
-                        report__report_type=report_type).values(
-                        "dkim").annotate(cnt=Sum("count"))
+                    "cnt": cnt,
+                    "label": choices.DMARC_RESULT_LABEL.get(result)
+                } for result, cnt in sorted(message_cnts["dkim"].items())
             ],
-
             "spf" : [
                 {
-                    "cnt": res["cnt"],
-                    "label": dict(choices.DMARC_RESULT).get(res["spf"])
-                } for res in Record.objects.filter(
-                        report__report_type=report_type).values(
-                        "spf").annotate(cnt=Sum("count"))
+                    "cnt": cnt,
+                    "label": choices.DMARC_RESULT_LABEL.get(result)
+                } for result, cnt in sorted(message_cnts["spf"].items())
             ],
             "disposition" : [
                 {
-                    "cnt": res["cnt"],
-                    "label": dict(choices.DISPOSITION_TYPE).get(
-                            res["disposition"])
-                } for res in Record.objects.filter(
-                        report__report_type=report_type).values(
-                        "disposition").annotate(cnt=Sum("count"))
+                    "cnt": cnt,
+                    "label": choices.DISPOSITION_TYPE_LABEL.get(result)
+                } for result, cnt in sorted(
+                        message_cnts["disposition"].items())
             ],
         }
 
 
+    @staticmethod
+    def getCachedOverviewSummary(report_type=choices.INCOMING):
+        """Return `getOverviewSummary` for passed report type and the current
+        generation of the stored report data (see `getDataGeneration`) from
+        the cache, or compute and cache it, if it is not cached yet. Commands
+        that store or delete reports cache the new statistics right away
+        (see `cacheOverviewSummaries`). """
+        key = OVERVIEW_CACHE_KEY.format(report_type,
+                Report.getDataGeneration())
+        summary = cache.get(key)
+
+        if summary is None:
+            summary = Report.getOverviewSummary(report_type)
+            cache.set(key, summary, None)
+
+        return summary
+
+
+    @staticmethod
+    def cacheOverviewSummaries():
+        """Compute and cache `getOverviewSummary` for all report types and the
+        current generation of the stored report data, so that the Overview
+        page doesn't have to compute them on the next request. Must be called
+        after the transactions that stored or deleted reports are committed.
+        """
+        generation = Report.getDataGeneration()
+        for report_type, report_type_name in choices.REPORT_TYPE:
+            cache.set(OVERVIEW_CACHE_KEY.format(report_type, generation),
+                    Report.getOverviewSummary(report_type), None)
+
+
 
 class ReportError(models.Model):
     report = models.ForeignKey("Report")
@@ -186,9 +303,9 @@ class Record(models.Model):
     spf = models.IntegerField(choices=choices.DMARC_RESULT)
 
     # Identifiers
-    envelope_to = models.CharField(max_length=100, null=True)
-    envelope_from = models.CharField(max_length=100, null=True)
-    header_from = models.CharField(max_length=100, null=True)
+    envelope_to = models.ForeignKey("Domain", null=True, related_name="+")
+    envelope_from = models.ForeignKey("Domain", null=True, related_name="+")
+    header_from = models.ForeignKey("Domain", null=True, related_name="+")
 
     # Custom field for filter convenience (needs one join less)
     auth_result_dkim_count = models.IntegerField(default=0)
@@ -205,7 +322,7 @@ class PolicyOverrideReason(models.Model):
 
 class AuthResultDKIM(models.Model):
     record = models.ForeignKey("Record")
-    domain = models.CharField(max_length=100)
+    domain = models.ForeignKey("Domain")
     result = models.IntegerField(choices=choices.DKIM_RESULT)
     human_result = models.CharField(max_length=200, null=True)
 
@@ -213,12 +330,196 @@ class AuthResultDKIM(models.Model):
 
 class AuthResultSPF(models.Model):
     record = models.ForeignKey("Record")
-    domain = models.CharField(max_length=100)
+    domain = models.ForeignKey("Domain")
     scope = models.IntegerField(choices=choices.SPF_SCOPE, null=True)
     result = models.IntegerField(choices=choices.SPF_RESULT)
 
 
 
+class RecordFact(models.Model):
+    """Denormalized copy of a record with the report, reporter and
+    authentication result fields that analysis views filter by, so that
+    analysis view queries (see `FilterSet.getQuery`) need neither joins nor
+    DISTINCT. Facts are stored by the parser together with their records and
+    can be rebuilt from stored records with `python manage.py rebuild`.
+
+    Raw DKIM and SPF authentication results are stored as space separated
+    "<domain id>:<numeric result>" strings with leading and trailing space
+    (see `_auth_results_str`), e.g. " 12:2 7:3 ", so that they can be
+    filtered with `contains` on any db.
+    """
+    record = models.OneToOneField("Record", primary_key=True)
+
+    # Report
+    report_type = models.IntegerField(choices=choices.REPORT_TYPE)
+    report_id = models.CharField(max_length=200)
+    date_range_begin = models.DateTimeField()
+    date_range_end = models.DateTimeField()
+    reporter_org_name = models.CharField(max_length=100)
+    domain = models.ForeignKey("Domain", related_name="+")
+
+    # Record
+    source_ip = models.GenericIPAddressField(null=True)
+    country_iso_code = models.CharField(max_length=2, null=True)
+    count = models.IntegerField()
+    disposition = models.IntegerField(choices=choices.DISPOSITION_TYPE)
+    dkim = models.IntegerField(choices=choices.DMARC_RESULT)
+    spf = models.IntegerField(choices=choices.DMARC_RESULT)
+
+    # Authentication results
+    auth_result_dkim_count = models.IntegerField(default=0)
+    dkim_results = models.TextField(default=" ")
+    spf_results = models.TextField(default=" ")
+
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["report_type", "date_range_begin"],
+                    name="fact_type_begin_idx")
+        ]
+
+
+    @staticmethod
+    def fromRecord(record, results_dkim, results_spf):
+        """Return new (unsaved) fact for passed record, which must have a
+        primary key, and passed lists of its DKIM and SPF authentication
+        results. Report and reporter are taken from the record, i.e.
+        `record.report.reporter` should be cached to not query the db. """
+        report = record.report
+        return RecordFact(
+                record_id=record.pk,
+                report_type=report.report_type,
+                report_id=report.report_id,
+                date_range_begin=report.date_range_begin,
+                date_range_end=report.date_range_end,
+                reporter_org_name=report.reporter.org_name,
+                domain_id=report.domain_id,
+                source_ip=record.source_ip,
+                country_iso_code=record.country_iso_code,
+                count=record.count,
+                disposition=record.disposition,
+                dkim=record.dkim,
+                spf=record.spf,
+                auth_result_dkim_count=len(results_dkim),
+                dkim_results=_auth_results_str(results_dkim),
+                spf_results=_auth_results_str(results_spf))
+
+
+    def getDkimResults(self):
+        """Return list of domain id and numeric result tuples of this fact's
+        raw DKIM authentication results. """
+        return _parse_auth_results(self.dkim_results)
+
+
+    def getSpfResults(self):
+        """Return list of domain id and numeric result tuples of this fact's
+        raw SPF authentication results. """
+        return _parse_auth_results(self.spf_results)
+
+
+
+class RecordRollup(models.Model):
+    """Message counts of the records of a report summed up per country,
+    aligned DKIM and SPF result and disposition, i.e. typically a few rows
+    per report instead of one per sending IP address. Like `RecordFact`,
+    rollups are stored by the parser together with the records and can be
+    rebuilt with `python manage.py rebuild`.
+
+    Rollups have the same field names as facts, so that filter set queries
+    (see `FilterSet.getQuery`) can be used for both. Message counts of filter
+    sets that only have filters on rollup fields (see `rollup_compatible`)
+    are queried from rollups (see `FilterSet.getCountModel`). Rollups are
+    keyed by the report's begin date instead of the day, so that date range
+    filters match the same reports as on facts. DMARC aggregate reports
+    usually cover one day, hence that is not more than one rollup per day,
+    reporter, domain and aggregated fields.
+
+    A report's records may be summed up in several rollups with the same
+    aggregated fields (e.g. if the parser stored them in several batches),
+    i.e. rollups must always be summed up when queried.
+    """
+    report = models.ForeignKey("Report")
+    report_type = models.IntegerField(choices=choices.REPORT_TYPE)
+    date_range_begin = models.DateTimeField()
+    reporter_org_name = models.CharField(max_length=100)
+    domain = models.ForeignKey("Domain", related_name="+")
+
+    country_iso_code = models.CharField(max_length=2, null=True)
+    dkim = models.IntegerField(choices=choices.DMARC_RESULT)
+    spf = models.IntegerField(choices=choices.DMARC_RESULT)
+    disposition = models.IntegerField(choices=choices.DISPOSITION_TYPE)
+    count = models.IntegerField()
+
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["report_type", "date_range_begin"],
+                    name="rollup_type_begin_idx")
+        ]
+
+
+    @staticmethod
+    def fromRecords(records):
+        """Return list of new (unsaved) rollups for passed records. Report
+        and reporter are taken from the records, i.e. `record.report.reporter`
+        should be cached to not query the db. """
+        rollups = collections.OrderedDict()
+        for record in records:
+            key = (record.report_id, record.country_iso_code, record.dkim,
+                    record.spf, record.disposition)
+
+            if key in rollups:
+                rollups[key].count += record.count
+                continue
+
+            report = record.report
+            rollups[key] = RecordRollup(
+                    report_id=report.pk,
+                    report_type=report.report_type,
+                    date_range_begin=report.date_range_begin,
+                    reporter_org_name=report.reporter.org_name,
+                    domain_id=report.domain_id,
+                    country_iso_code=record.country_iso_code,
+                    dkim=record.dkim,
+                    spf=record.spf,
+                    disposition=record.disposition,
+                    count=record.count)
+
+        return list(rollups.values())
+
+
+
+class FailedReport(models.Model):
+    """Ledger of report files that could not be stored by the parser. Entries
+    are replayed with `python manage.py parse --retry-failed` and removed once
+    the report is stored successfully. The report type and format options of
+    the failed run are kept to replay the file with the same options. """
+    path = models.CharField(max_length=1024, unique=True)
+    report_hash = models.CharField(max_length=32, null=True)
+    report_type = models.IntegerField(choices=choices.REPORT_TYPE)
+    univie = models.BooleanField(default=False)
+    error = models.TextField()
+    date_failed = models.DateTimeField(auto_now=True)
+
+    def __unicode__(self):
+        return self.path
+
+
+
+class ParsedFile(models.Model):
+    """Size and modification time of files that the parser read without
+    errors, keyed by path. Unchanged files are skipped without reading them
+    again, unless `python manage.py parse --rescan` is used. """
+    path = models.CharField(max_length=1024, unique=True)
+    size = models.BigIntegerField()
+    mtime = models.FloatField()
+    date_parsed = models.DateTimeField(auto_now=True)
+
+    def __unicode__(self):
+        return self.path
+
+
+
 
 """DMARC Viewer Analysis View Models
 
@@ -295,20 +596,95 @@ class View(OrderedModel):
         return _get_related_managers(self, ViewFilterField)
 
 
+    def getPlan(self):
+        """Return compiled filters of this view (see `ViewPlan`) for the
+        current revision of this view (see `getRevision`) from the cache, or
+        compile and cache them, if they are not cached yet. The map, line
+        chart and table data of a view are requested separately, but only the
+        first request queries the filter fields. """
+        key = PLAN_CACHE_KEY.format(self.id, View.getRevision(self.id))
+        plan = cache.get(key)
+
+        if plan is None:
+            plan = ViewPlan(self)
+            cache.set(key, plan, PLAN_CACHE_TIMEOUT)
+
+        return plan
+
+
+    @staticmethod
+    def getRevision(view_id):
+        """Return revision of the view with passed id, i.e. a random token
+        that is replaced whenever the view, its filter sets or filter fields
+        are saved or deleted (see `updateRevision`). Revisions are only stored
+        in the cache, a missing revision is created. """
+        key = REVISION_CACHE_KEY.format(view_id)
+        revision = cache.get(key)
+
+        if revision is None:
+            # Another process might create the revision at the same time
+            cache.add(key, uuid.uuid4().hex, None)
+            revision = cache.get(key)
+
+        return revision
+
+
+    @staticmethod
+    def updateRevision(view_id):
+        """Replace revision of the view with passed id (see `getRevision`),
+        once the current transaction is committed, so that cached data of
+        the view's old revision is no longer used.
+
+        A random token (instead of a counter) can't collide with the
+        revision of cached data, even if the revision itself was evicted from
+        the cache.
+        """
+        transaction.on_commit(lambda: cache.set(
+                REVISION_CACHE_KEY.format(view_id), uuid.uuid4().hex, None))
+
+
+    def getDataCacheKey(self, name, *args):
+        """Return key to cache data of passed name (e.g. "map") and
+        arguments (e.g. table page) of this view, for the current revision of
+        this view (see `getRevision`) and generation of the stored report
+        data (see `Report.getDataGeneration`), i.e. cached data is no longer
+        used once the view is edited or reports are stored or deleted. For
+        views with a dynamic date range, the key also contains the current
+        day, because the date range moves each day (see
+        `DateRange.getBeginEnd`). """
+        day = ""
+        if (self.getPlan().date_range.dr_type ==
+                choices.DATE_RANGE_TYPE_VARIABLE):
+            day = datetime.now().strftime("%Y%m%d")
+
+        # Arguments are hashed to keep the key short and free of whitespace
+        return DATA_CACHE_KEY.format(name, self.id, View.getRevision(self.id),
+                Report.getDataGeneration(), day, hashlib.md5(json.dumps(args,
+                sort_keys=True)).hexdigest())
+
+
     def getTableRecords(self):
-        """Return DMARC report table records for this view.
+        """Return DMARC report table records (as `RecordFact` objects) for
+        this view.
 
         TODO: It would be nice to annotate the query with the related filter
-        set's label and color to use that info in the table. (Beware of
-        duplicate rows).
+        set's label and color to use that info in the table.
 
         """
-        # Combine non-empty filter queries from all filter sets of this view
-        query = reduce(lambda x, y: x | y, [fs.getQuery()
-                for fs in self.filterset_set.all()])
+        plan = self.getPlan()
+
+        # Apply the view filters once and combine non-empty filter set
+        # filter queries from all filter sets of this view
+        records = RecordFact.objects.filter(plan.getViewQuery())
+        queries = [filter_set_plan.getFilterSetQuery()
+                for filter_set_plan in plan.filter_sets]
 
-        return Record.objects.filter(query).distinct().order_by(
-                "report__date_range_begin")
+        # An empty filter set query matches all records
+        if all(queries):
+            records = records.filter(reduce(lambda x, y: x | y, queries))
+
+        # One fact per record, hence no duplicate rows to `distinct` away
+        return records.order_by("date_range_begin")
 
 
     @staticmethod
@@ -317,8 +693,8 @@ class View(OrderedModel):
         corresponding table columns, used to sort datatables columns with
         django's order_by function.
         """
-        return ["report__reporter__org_name",
-                "report__domain",
+        return ["reporter_org_name",
+                "domain__name",
                 "dkim",
                 "spf",
                 "disposition",
@@ -327,9 +703,9 @@ class View(OrderedModel):
                 "count",
                 "source_ip",
                 "country_iso_code",
-                "report__date_range_begin",
-                "report__date_range_end",
-                "report__report_id"]
+                "date_range_begin",
+                "date_range_end",
+                "report_id"]
 
 
     @staticmethod
@@ -350,32 +726,47 @@ class View(OrderedModel):
         if records is None:
             records = self.getTableRecords()
 
+        records = list(records)
+
+        # Query the names of all domains in the table at once
+        domain_names = _get_domain_names(set(
+            [r.domain_id for r in records] + [
+                domain_id for r in records
+                    for domain_id, result in r.getDkimResults() +
+                            r.getSpfResults()
+            ]))
+
+        # Use precomputed lookup dictionaries instead of Django's
+        # `get_<field>_display`, which creates a dictionary on each call
         return [
             [
-                r.report.reporter.org_name,
-                r.report.domain,
-                r.get_dkim_display(),
-                r.get_spf_display(),
-                r.get_disposition_display(),
+                r.reporter_org_name,
+                domain_names[r.domain_id],
+                choices.DMARC_RESULT_LABEL.get(r.dkim, r.dkim),
+                choices.DMARC_RESULT_LABEL.get(r.spf, r.spf),
+                choices.DISPOSITION_TYPE_LABEL.get(r.disposition,
+                        r.disposition),
                 # For simplicity we concatenate raw DKIM and SPF results
                 # respectively and write each in one cell.
                 # TODO: Remove HTML markup here.
                 "<br>".join([
-                    "{0} ({1})".format(dkim.domain, dkim.get_result_display())
-                        for dkim in r.authresultdkim_set.all()
+                    "{0} ({1})".format(domain_names[domain_id],
+                            choices.DKIM_RESULT_LABEL.get(result, result))
+                        for domain_id, result in r.getDkimResults()
                 ]),
                 "<br>".join([
-                    "{0} ({1})".format(spf.domain, spf.get_result_display())
-                        for spf in r.authresultspf_set.all()
+                    "{0} ({1})".format(domain_names[domain_id],
+                            choices.SPF_RESULT_LABEL.get(result, result))
+                        for domain_id, result in r.getSpfResults()
                 ]),
                 r.count,
                 r.source_ip,
                 r.country_iso_code,
-                r.report.date_range_begin.strftime("%Y/%m/%d"),
-                r.report.date_range_end.strftime("%Y/%m/%d"),
-                r.report.report_id
+                r.date_range_begin.strftime("%Y/%m/%d"),
+                r.date_range_end.strftime("%Y/%m/%d"),
+                r.report_id
             ]
-            for r in list(records)
+            for r in records
         ]
 
 
@@ -389,25 +780,24 @@ class View(OrderedModel):
         """Return time line chart data for this view prepared for use with
         D3.js line chart. The time line chart shows the message count per day,
         per filter set. """
-        # Each view must have exactly one DateRange object
-        date_range = DateRange.objects.filter(foreign_key=self.id).first()
-        assert(date_range is not None)
+        plan = self.getPlan()
 
-        begin, end = date_range.getBeginEnd()
+        begin, end = plan.date_range.getBeginEnd()
         return {
             "begin" : begin.strftime("%Y%m%d"),
             "end" : end.strftime("%Y%m%d"),
             "data_sets" : [
                 {
-                    "label" : filter_set.label,
-                    "color" : filter_set.color,
+                    "label" : filter_set_plan.label,
+                    "color" : filter_set_plan.color,
                     "data" : [
                         {
                             "cnt": row["cnt"],
                             "date": row["date"].strftime("%Y%m%d")
-                        } for row in filter_set.getMessageCountPerDay()
+                        } for row in rows
                     ],
-                } for filter_set in self.filterset_set.all()
+                } for filter_set_plan, rows in zip(plan.filter_sets,
+                        plan.getMessageCountsPerDay())
             ]
         }
 
@@ -416,12 +806,15 @@ class View(OrderedModel):
         """Return map data for this view prepared for use with D3.js DataMaps.
         A separate map for every filter set is created, with message count per
         country and color gradients. """
+        plan = self.getPlan()
+
         return [
             {
-                "label": filter_set.label,
-                "color": filter_set.color,
-                "data" : list(filter_set.getMessageCountPerCountry())
-            } for filter_set in self.filterset_set.all()
+                "label": filter_set_plan.label,
+                "color": filter_set_plan.color,
+                "data" : rows
+            } for filter_set_plan, rows in zip(plan.filter_sets,
+                    plan.getMessageCountsPerCountry())
         ]
 
 
@@ -454,91 +847,61 @@ class FilterSet(models.Model):
     multiple_dkim = models.NullBooleanField()
 
 
-    def getQuery(self):
-        """Return combined view and filter set filters for this filter set
-        as complex SQL query using django's `Q` object.
-
-        See
-        https://docs.djangoproject.com/en/1.11/ref/models/querysets/#q-objects
-        for more information.
-
-        """
+    def getFilterFields(self):
+        """Return dictionary of filter field classes and lists of the
+        corresponding view and filter set filter field objects of this filter
+        set, for all classes that have filter field objects. """
         # Get a list of object managers, each of which containing the
         # corresponding view and filter set filter field objects of all
         # available filter set classes.
-        filter_field_managers = [
+        return _get_filter_fields_by_class([
             manager for manager in self.getFilterSetFilterFieldManagers()
         ] + [
             manager for manager in self.view.getViewFilterFieldManagers()
-        ]
+        ])
 
-        # Create an OR query for all filter fields of the same class
-        or_queries = []
-        for manager in filter_field_managers:
-            filter_fields = manager.all()
-            if filter_fields:
-                or_queries.append(
-                        reduce(lambda x, y: x | y, [
-                                filter_field.getRecordFilter()
-                                for filter_field in filter_fields
-                                ]
-                            )
-                        )
 
-        # If there are different filter field OR queries, combine those
-        # queries as one AND query
-        if or_queries:
-            return reduce(lambda x, y: x & y, [
-                    or_query for or_query in or_queries
-                    ]
-                )
-        # If the filter set does not have any filter fields, we return an empty
-        # query, which is equivalent to querying all objects, e.g.:
-        # `View.objects.all() == View.objects.filter(Q())`
-        else:
-            return Q()
+    def getQuery(self, filter_fields_by_class=None):
+        """Return combined view and filter set filters for this filter set
+        as complex SQL query on `RecordFact` (or `RecordRollup`, see
+        `getCountModel`) using django's `Q` object. Filter fields as returned
+        by `getFilterFields` may be passed to not query them again.
+
+        See
+        https://docs.djangoproject.com/en/1.11/ref/models/querysets/#q-objects
+        for more information.
 
+        """
+        if filter_fields_by_class is None:
+            filter_fields_by_class = self.getFilterFields()
 
-    def getMessageCountPerDay(self):
-        """Return list of date and message count tuples, ordered by date,
-        for this filter set. """
+        return _get_query(filter_fields_by_class)
 
-        # NOTE: We first filter distinct record ids for this filter set
-        # and then use those record ids as additional filter parameter when we
-        # perform the actual query for message count by date. This workaround
-        # is (?) required to not get duplicate record rows that we can't
-        # `distinct` away when using `annotate`, due to some crazy db joins.
-        # TODO: Revise the workaround
 
-        # Query distinct record ids for this filter set
-        distinct_records = Record.objects.filter(
-                self.getQuery()).distinct().values("id")
+    @staticmethod
+    def getCountModel(filter_fields_by_class):
+        """Return model to query message counts from for passed filter fields
+        (see `getFilterFields`), i.e. `RecordRollup` if all filter fields
+        are rollup compatible and `RecordFact` otherwise. """
+        if all(filter_class.rollup_compatible
+                for filter_class in filter_fields_by_class):
+            return RecordRollup
+
+        return RecordFact
 
 
-        # Query the sum of message counts per day for above filtered
-        # records, ordered by date in ascending order
-        return Record.objects.filter(id__in=distinct_records).values(
-                "report__date_range_begin").annotate(
-                date=TruncDay("report__date_range_begin"),
-                cnt=Sum("count")).values("date", "cnt").order_by("date")
+    def getMessageCountPerDay(self):
+        """Return list of date and message count tuples, ordered by date,
+        for this filter set. See `FilterSetPlan.getMessageCountPerDay`. """
+        return FilterSetPlan(self, self.getFilterFields()
+                ).getMessageCountPerDay()
 
 
     def getMessageCountPerCountry(self):
         """Return list of country and message count tuples for this filter set.
-        """
-        # NOTE: See note in `getMessageCountPerDay` for more info about two
-        # query workaround
-
-        # Query distinct record ids for this filter set
-        distinct_records = Record.objects.filter(
-                self.getQuery()).distinct().values("id")
-
-        # Query the sum of message counts per country for above filtered
-        # records, ordered by date in ascending order
-        return Record.objects.filter(
-                id__in=distinct_records).values(
-                "country_iso_code").annotate(cnt=Sum("count")).values(
-                "country_iso_code", "cnt")
+        See `FilterSetPlan.getMessageCountPerCountry`. """
+        return FilterSetPlan(self, self.getFilterFields()
+                ).getMessageCountPerCountry()
 
 
     def getFilterSetFilterFieldManagers(self):
@@ -549,12 +912,188 @@ class FilterSet(models.Model):
 
 
 
+class ViewPlan(object):
+    """Compiled filters of an analysis view, i.e. the view's date range and
+    a `FilterSetPlan` for each of its filter sets. Plans are plain (picklable)
+    objects, which `View.getPlan` caches per view revision, so that requests
+    for the view's map, line chart and table data don't have to query and
+    combine the filter fields of the view and its filter sets again. """
+
+
+    def __init__(self, view):
+        """Compile plan for passed view, querying the view filter fields and
+        the filter set filter fields of all filter sets of the view at once,
+        i.e. with one query per filter field class. """
+        view_filter_fields_by_class = _get_filter_fields_by_class(
+                view.getViewFilterFieldManagers())
+        self.view_filter_fields_by_class = view_filter_fields_by_class
+
+        # Each view must have exactly one DateRange object
+        assert(DateRange in view_filter_fields_by_class)
+        self.date_range = view_filter_fields_by_class[DateRange][0]
+
+        self.filter_sets = []
+        for filter_set in view.filterset_set.prefetch_related(
+                *_get_related_accessor_names(FilterSet, FilterSetFilterField)):
+            # Managers return the prefetched filter fields
+            filter_fields_by_class = _get_filter_fields_by_class(
+                    filter_set.getFilterSetFilterFieldManagers())
+            filter_fields_by_class.update(view_filter_fields_by_class)
+
+            self.filter_sets.append(
+                    FilterSetPlan(filter_set, filter_fields_by_class))
+
+
+    def getViewQuery(self):
+        """Return query for the view filter fields of this plan, i.e. the
+        filters that all filter sets of the view share. """
+        return _get_query(self.view_filter_fields_by_class)
+
+
+    def getMessageCountQuerySets(self, group_field, **group_expressions):
+        """Return list of tuples of filter set indexes and query sets that
+        sum up the message counts per passed group field (optionally defined
+        by passed expressions) for the filter sets with these indexes, one
+        query set per count model (see `FilterSet.getCountModel`).
+
+        Each query set scans the rows of its model that match the view
+        filters and any of its filter sets once, and sums up the message
+        count of each row only for the filter sets the row matches, using
+        conditional aggregation, i.e.
+        `SUM(CASE WHEN <filter set query> THEN count END) AS cnt_<index>`.
+        The sum is NULL for groups without rows that match the filter set.
+        """
+        indexes_by_model = collections.OrderedDict()
+        for idx, filter_set_plan in enumerate(self.filter_sets):
+            indexes_by_model.setdefault(filter_set_plan.count_model,
+                    []).append(idx)
+
+        query_sets = []
+        for model, indexes in indexes_by_model.iteritems():
+            queries = [self.filter_sets[idx].getFilterSetQuery()
+                    for idx in indexes]
+
+            sums = {}
+            for idx, query in zip(indexes, queries):
+                # An empty query matches all rows
+                if query:
+                    sums["cnt_{}".format(idx)] = Sum(Case(When(query,
+                            then="count"), output_field=IntegerField()))
+
+                else:
+                    sums["cnt_{}".format(idx)] = Sum("count")
+
+            query_set = model.objects.filter(self.getViewQuery())
+            if all(queries):
+                query_set = query_set.filter(
+                        reduce(lambda x, y: x | y, queries))
+
+            query_sets.append((indexes, query_set.annotate(
+                    **group_expressions).values(group_field).annotate(
+                    **sums).order_by(group_field)))
+
+        return query_sets
+
+
+    def getMessageCounts(self, group_field, **group_expressions):
+        """Return list of message counts per passed group field for each
+        filter set of this plan, i.e. lists of dictionaries with the group
+        field and "cnt" keys, querying all filter sets at once (see
+        `getMessageCountQuerySets`). """
+        message_counts = [[] for filter_set_plan in self.filter_sets]
+
+        for indexes, query_set in self.getMessageCountQuerySets(group_field,
+                **group_expressions):
+            for row in query_set:
+                for idx in indexes:
+                    cnt = row["cnt_{}".format(idx)]
+                    if cnt is not None:
+                        message_counts[idx].append({
+                            group_field: row[group_field],
+                            "cnt": cnt
+                        })
+
+        return message_counts
+
+
+    def getMessageCountsPerDay(self):
+        """Return list of date and message count lists, ordered by date, for
+        each filter set of this plan. """
+        return self.getMessageCounts("date",
+                date=TruncDay("date_range_begin"))
+
+
+    def getMessageCountsPerCountry(self):
+        """Return list of country and message count lists for each filter set
+        of this plan. """
+        return self.getMessageCounts("country_iso_code")
+
+
+
+class FilterSetPlan(object):
+    """Compiled filters of a filter set, i.e. its label and color, the view
+    and filter set filter fields by class (see `FilterSet.getFilterFields`)
+    and the model to query message counts from (see
+    `FilterSet.getCountModel`). See `ViewPlan`. """
+
+
+    def __init__(self, filter_set, filter_fields_by_class):
+        self.label = filter_set.label
+        self.color = filter_set.color
+        self.filter_fields_by_class = filter_fields_by_class
+        self.count_model = FilterSet.getCountModel(filter_fields_by_class)
+
+
+    def getQuery(self):
+        """Return query for the filter fields of this plan. See
+        `FilterSet.getQuery`. """
+        return _get_query(self.filter_fields_by_class)
+
+
+    def getFilterSetQuery(self):
+        """Return query for the filter set filter fields of this plan only,
+        i.e. without the view filter fields. """
+        return _get_query({
+            filter_class: filter_fields
+                for filter_class, filter_fields
+                    in self.filter_fields_by_class.iteritems()
+                if issubclass(filter_class, FilterSetFilterField)
+        })
+
+
+    def getMessageCountPerDay(self):
+        """Return list of date and message count tuples, ordered by date,
+        for the filter set of this plan. """
+        # Query the sum of message counts per day of the filtered records
+        # (one fact per record, i.e. no duplicates), or rollups, ordered by
+        # date in ascending order
+        return self.count_model.objects.filter(self.getQuery()
+                ).annotate(date=TruncDay("date_range_begin")).values("date"
+                ).annotate(cnt=Sum("count")).values("date", "cnt"
+                ).order_by("date")
+
+
+    def getMessageCountPerCountry(self):
+        """Return list of country and message count tuples for the filter set
+        of this plan. """
+        # Query the sum of message counts per country of the filtered records
+        # or rollups
+        return self.count_model.objects.filter(self.getQuery()
+                ).values("country_iso_code").annotate(cnt=Sum("count")
+                ).values("country_iso_code", "cnt")
+
+
+
 class FilterSetFilterField(models.Model):
     """Abstract parent class for all filter set filter fields, which are used
     to define filters corresponding to DMARC aggregate report attributes.
     Also see `ViewFilterField` for additional info.
+
+    Subclasses whose `record_field` is also a field of `RecordRollup` set
+    `rollup_compatible` to True.
     """
     foreign_key = models.ForeignKey("FilterSet")
+    rollup_compatible = False
 
 
     def getRecordFilter(self):
@@ -567,12 +1106,12 @@ class FilterSetFilterField(models.Model):
         ```
         >>> sender_filter = ReportSender(value="google.com")
         >>> sender_filter.record_field
-        'Report.Reporter.org_name'
+        'reporter_org_name'
         >>> query = report_sender_filter.getRecordFilter()
         >>> query
-        <Q: (AND: ('report__reporter__org_name', 'google.com'))>
-        >>> from website.models import Record
-        >>> Record.objects.filter(query)
+        <Q: (AND: ('reporter_org_name', 'google.com'))>
+        >>> from website.models import RecordFact
+        >>> RecordFact.objects.filter(query)
         <QuerySet [records with sender domain 'google.com', ...]>
         ```
         """
@@ -606,6 +1145,9 @@ class ViewFilterField(models.Model):
     """
     foreign_key = models.ForeignKey("View")
 
+    # Report type and date range are also fields of `RecordRollup`
+    rollup_compatible = True
+
 
     class Meta:
         abstract = True
@@ -620,7 +1162,7 @@ class ReportType(ViewFilterField):
 
     def getRecordFilter(self):
         """ See docstring of `FilterSetFilterField.getRecordFilter`. """
-        return Q(**{"report__report_type": self.value})
+        return Q(**{"report_type": self.value})
 
 
 
@@ -666,6 +1208,10 @@ class DateRange(ViewFilterField):
                         if unit is not None]))
                 )
 
+            # Begin at midnight so that the date range only moves once a day,
+            # which also allows to cache view data per day
+            begin = begin.replace(hour=0, minute=0, second=0, microsecond=0)
+
             return begin, end
 
         else:
@@ -683,8 +1229,8 @@ class DateRange(ViewFilterField):
         See docstring of `FilterSetFilterField.getRecordFilter` for generic
         case. """
         begin, end = self.getBeginEnd()
-        return (Q(**{"report__date_range_begin__gte" : begin})
-                & Q(**{"report__date_range_begin__lte": end}))
+        return (Q(**{"date_range_begin__gte" : begin})
+                & Q(**{"date_range_begin__lte": end}))
 
 
     def __str__(self):
@@ -693,36 +1239,70 @@ class DateRange(ViewFilterField):
 
 class ReportSender(FilterSetFilterField):
     """See docstring of `FilterSetFilterField`. """
-    record_field = "Report.Reporter.org_name"
+    record_field = "reporter_org_name"
+    rollup_compatible = True
     value = models.CharField(max_length=100)
 
 
 class ReportReceiverDomain(FilterSetFilterField):
     """See docstring of `FilterSetFilterField`. """
-    record_field = "Report.domain"
+    record_field = "domain"
+    rollup_compatible = True
     value = models.CharField(max_length=100)
 
 
+    def getRecordFilter(self):
+        """Special case for filtering by domain id, looked up by name in a
+        subquery. See docstring of `FilterSetFilterField.getRecordFilter` for
+        generic case. """
+        return Q(**{self.record_field + "__in":
+                Domain.objects.filter(name=self.value).values("id")})
+
+
 class SourceIP(FilterSetFilterField):
-    """See docstring of `FilterSetFilterField`. """
+    """See docstring of `FilterSetFilterField`. The value is a v4 or v6 IP
+    address or a network in CIDR notation (see `networks.normalize`). """
     record_field = "source_ip"
-    # GenericIPAddressField supports v4 and v6 IP addresses.
-    # TODO: Support CIDR notation.
-    value = models.GenericIPAddressField()
+    value = models.CharField(max_length=43)
+
+
+    def getRecordFilter(self):
+        """Special case for filtering by network, which matches all source IPs
+        in the network (see `website.networks`). See docstring of
+        `FilterSetFilterField.getRecordFilter` for generic case. """
+        if networks.is_network(self.value):
+            return Q(**{self.record_field + "__in_network": self.value})
+
+        return Q(**{self.record_field: self.value})
 
 
 class RawDkimDomain(FilterSetFilterField):
     """See docstring of `FilterSetFilterField`. """
-    record_field = "AuthResultDKIM.domain"
+    record_field = "dkim_results"
     value = models.CharField(max_length=100)
 
 
+    def getRecordFilter(self, result_filter=None):
+        """Special case for filtering the DKIM results string of a
+        `RecordFact` (see its docstring). Optionally a `RawDkimResult` filter
+        can be passed, to match only DKIM results that have both, this
+        filter's domain and the passed filter's result. """
+        result = "" if result_filter is None else result_filter.value
+        return _auth_results_filter(self.record_field, self.value, result)
+
+
 class RawDkimResult(FilterSetFilterField):
     """See docstring of `FilterSetFilterField`. """
-    record_field = "AuthResultDKIM.result"
+    record_field = "dkim_results"
     value = models.IntegerField(choices=choices.DKIM_RESULT)
 
 
+    def getRecordFilter(self):
+        """Special case for filtering the DKIM results string of a
+        `RecordFact` (see its docstring). """
+        return _auth_results_filter(self.record_field, None, self.value)
+
+
 class MultipleDkim(FilterSetFilterField):
     """See docstring of `FilterSetFilterField`. """
     value = models.BooleanField(default=False)
@@ -732,35 +1312,214 @@ class MultipleDkim(FilterSetFilterField):
 
 class RawSpfDomain(FilterSetFilterField):
     """See docstring of `FilterSetFilterField`. """
-    record_field = "AuthResultSPF.domain"
+    record_field = "spf_results"
     value = models.CharField(max_length=100)
 
 
+    def getRecordFilter(self, result_filter=None):
+        """See docstring of `RawDkimDomain.getRecordFilter`. """
+        result = "" if result_filter is None else result_filter.value
+        return _auth_results_filter(self.record_field, self.value, result)
+
+
 class RawSpfResult(FilterSetFilterField):
     """See docstring of `FilterSetFilterField`. """
-    record_field = "AuthResultSPF.result"
+    record_field = "spf_results"
     value = models.IntegerField(choices=choices.SPF_RESULT)
 
 
+    def getRecordFilter(self):
+        """See docstring of `RawDkimResult.getRecordFilter`. """
+        return _auth_results_filter(self.record_field, None, self.value)
+
+
 class AlignedDkimResult(FilterSetFilterField):
     """See docstring of `FilterSetFilterField`. """
     record_field = "dkim"
+    rollup_compatible = True
     value = models.IntegerField(choices=choices.DMARC_RESULT)
 
 
 class AlignedSpfResult(FilterSetFilterField):
     """See docstring of `FilterSetFilterField`. """
     record_field = "spf"
+    rollup_compatible = True
     value = models.IntegerField(choices=choices.DMARC_RESULT)
 
 
 class Disposition(FilterSetFilterField):
     """See docstring of `FilterSetFilterField`. """
     record_field = "disposition"
+    rollup_compatible = True
     value = models.IntegerField(choices=choices.DISPOSITION_TYPE)
 
 
 
+def _auth_results_str(results):
+    """Return string of passed DKIM or SPF authentication results for
+    `RecordFact.dkim_results` and `RecordFact.spf_results` respectively,
+    e.g. " 12:2 7:3 ". """
+    return " " + "".join([
+        "{0}:{1} ".format(result.domain_id, result.result)
+            for result in results
+    ])
+
+
+
+def _parse_auth_results(results_str):
+    """Return list of domain id and numeric result tuples for passed string
+    created with `_auth_results_str`. """
+    results = []
+    for result in results_str.split():
+        domain_id, value = result.split(":")
+        results.append((int(domain_id), int(value)))
+
+    return results
+
+
+
+def _auth_results_filter(field, domain=None, result=""):
+    """Return query for authentication results strings (see
+    `_auth_results_str`) in passed `RecordFact` field, that contain a result
+    with passed domain name and/or passed result. Btree indexes can't serve
+    `contains`, on PostgreSQL a trigram index does (see `website.apps`). """
+    domain_id = ""
+    if domain is not None:
+        domain_id = Domain.objects.filter(name=domain).values_list("id",
+                flat=True).first()
+
+        # No record has an authentication result for an unknown domain
+        if domain_id is None:
+            return Q(pk__in=[])
+
+        domain_id = " {}".format(domain_id)
+
+    if result != "":
+        result = "{} ".format(result)
+
+    return Q(**{field + "__contains": "{0}:{1}".format(domain_id, result)})
+
+
+
+def _get_domain_names(domain_ids):
+    """Return dictionary of passed domain ids and the corresponding domain
+    names, querying at most 500 domains at once (SQLite limits the number of
+    query parameters). """
+    domain_ids = list(domain_ids)
+    domain_names = {}
+    for idx in range(0, len(domain_ids), 500):
+        domain_names.update(Domain.objects.filter(
+                id__in=domain_ids[idx:idx + 500]).values_list("id", "name"))
+
+    return domain_names
+
+
+
+def _get_query(filter_fields_by_class):
+    """Return combined query for passed filter fields by class (see
+    `FilterSet.getFilterFields`). See `FilterSet.getQuery`. """
+    filter_fields_by_class = dict(filter_fields_by_class)
+
+    # Raw DKIM (SPF) domain and result filters must match the same
+    # authentication result, hence we create one OR query for all pairs
+    # of domain and result filter fields
+    or_queries = []
+    for domain_class, result_class in ((RawDkimDomain, RawDkimResult),
+            (RawSpfDomain, RawSpfResult)):
+        if (domain_class in filter_fields_by_class and
+                result_class in filter_fields_by_class):
+            or_queries.append(
+                    reduce(lambda x, y: x | y, [
+                            domain_field.getRecordFilter(result_field)
+                            for domain_field in filter_fields_by_class.pop(
+                                    domain_class)
+                            for result_field in filter_fields_by_class[
+                                    result_class]
+                            ]
+                        )
+                    )
+            del filter_fields_by_class[result_class]
+
+    # Create an OR query for all filter fields of the same class
+    for filter_fields in filter_fields_by_class.values():
+        or_queries.append(
+                reduce(lambda x, y: x | y, [
+                        filter_field.getRecordFilter()
+                        for filter_field in filter_fields
+                        ]
+                    )
+                )
+
+    # If there are different filter field OR queries, combine those
+    # queries as one AND query
+    if or_queries:
+        return reduce(lambda x, y: x & y, [
+                or_query for or_query in or_queries
+                ]
+            )
+    # If the filter set does not have any filter fields, we return an empty
+    # query, which is equivalent to querying all objects, e.g.:
+    # `View.objects.all() == View.objects.filter(Q())`
+    else:
+        return Q()
+
+
+
+def _get_filter_fields_by_class(managers):
+    """Return dictionary of model classes and lists of the filter field
+    objects of passed filter field managers, for all managers that have
+    filter field objects. """
+    filter_fields_by_class = {}
+    for manager in managers:
+        filter_fields = list(manager.all())
+        if filter_fields:
+            filter_fields_by_class[manager.model] = filter_fields
+
+    return filter_fields_by_class
+
+
+
+def update_view_revision(sender, instance, **kwargs):
+    """Receiver for `post_save` and `post_delete` signals of views, filter
+    sets and filter fields, which updates the revision of the affected view
+    (see `View.updateRevision`). Connected in `website.apps`. """
+    if isinstance(instance, View):
+        view_id = instance.id
+
+    elif isinstance(instance, FilterSet):
+        view_id = instance.view_id
+
+    elif isinstance(instance, ViewFilterField):
+        view_id = instance.foreign_key_id
+
+    else:
+        view_id = FilterSet.objects.filter(pk=instance.foreign_key_id
+                ).values_list("view_id", flat=True).first()
+
+        # Filter fields of deleted filter sets, which updated the revision
+        if view_id is None:
+            return
+
+    View.updateRevision(view_id)
+
+
+
+def _get_related_accessor_names(model, parent_class=False):
+    """Internal helper method to get the names of the attributes of the
+    passed model (class or object), which return managers for objects that
+    are related to the model by foreign key. Optionally, returns only names
+    for subclasses of a specified parent class. See `_get_related_managers`.
+    """
+    accessor_names = []
+    for rel in model._meta._get_fields(False):
+        # Check for parent class if wanted
+        if parent_class and not issubclass(rel.related_model, parent_class):
+            continue
+        accessor_names.append(rel.get_accessor_name())
+    return accessor_names
+
+
+
 def _get_related_managers(obj, parent_class=False):
     """Internal helper method to get managers for objects that are related to
     the passed object by foreign key and use class inheritance (django models
@@ -780,15 +1539,8 @@ def _get_related_managers(obj, parent_class=False):
     - `django_polymorphic` (didn't work as expected)
 
     """
-    foreign_object_relations = obj._meta._get_fields(False)
-    foreign_managers = []
-
-    for rel in foreign_object_relations:
-        # Check for parent class if wanted
-        if parent_class and not issubclass(rel.related_model, parent_class):
-            continue
-        foreign_managers.append(getattr(obj, rel.get_accessor_name()))
-    return foreign_managers
+    return [getattr(obj, accessor_name) for accessor_name in
+            _get_related_accessor_names(obj, parent_class)]
 
 
 
@@ -0,0 +1,132 @@
+"""
+<Program Name>
+    networks.py
+
+<Author>
+    Lukas Puehringer <luk.puehringer@gmail.com>
+
+<Started>
+    October, 2026
+
+<Copyright>
+    See LICENSE for licensing information.
+
+<Purpose>
+    IP network (CIDR notation) support for source IP filters (see
+    `website.models.SourceIP`) and source IP choices of the filter form (see
+    `website.views.get_choices`).
+
+    Defines an `in_network` lookup for `GenericIPAddressField`s, e.g.
+    `RecordFact.objects.filter(source_ip__in_network="192.0.2.0/24")`, which
+    matches all addresses of the passed network. On PostgreSQL the lookup uses
+    the `inet` containment operator `<<=`, which a GiST index (see
+    `website.apps`) can serve. On SQLite it calls a Python function, which is
+    registered on each new db connection (see `register_sqlite_functions`),
+    and on MySQL it compares the binary address with the network's first and
+    last address.
+
+"""
+import ipaddress
+
+from django.db.models import GenericIPAddressField, Lookup
+
+# Prefix length of the networks that are suggested as source IP choices
+AGGREGATE_PREFIXLEN = {
+    4: 24,
+    6: 64
+}
+
+# Parsed networks by string for `_ip_in_network`, which SQLite calls per row
+_NETWORKS = {}
+
+
+
+def normalize(value):
+    """Return passed IP address or network in CIDR notation as normalized
+    string, i.e. networks with host bits unset (e.g. "192.0.2.0/24" for
+    "192.0.2.1/24") and host networks (e.g. "192.0.2.1/32") as plain
+    address. Raises ValueError if passed value is neither. """
+    network = ipaddress.ip_network(unicode(value).strip(), strict=False)
+
+    if network.prefixlen == network.max_prefixlen:
+        return unicode(network.network_address)
+
+    return unicode(network.with_prefixlen)
+
+
+
+def is_network(value):
+    """Return True if passed (normalized) value is a network rather than a
+    single address. """
+    return "/" in value
+
+
+
+def aggregate(addresses):
+    """Return sorted list of distinct networks (see AGGREGATE_PREFIXLEN), that
+    contain passed IP addresses. """
+    networks = set()
+    for address in addresses:
+        address = ipaddress.ip_address(unicode(address))
+        networks.add(ipaddress.ip_network(u"{0}/{1}".format(address,
+                AGGREGATE_PREFIXLEN[address.version]), strict=False))
+
+    # Networks of different versions can't be compared
+    return [unicode(network) for network in sorted(networks,
+            key=lambda network: (network.version, network))]
+
+
+
+def _ip_in_network(address, network):
+    """SQLite function for the `in_network` lookup. """
+    if address is None or network is None:
+        return None
+
+    if network not in _NETWORKS:
+        _NETWORKS[network] = ipaddress.ip_network(network, strict=False)
+
+    try:
+        return ipaddress.ip_address(address) in _NETWORKS[network]
+
+    except ValueError:
+        return False
+
+
+
+def register_sqlite_functions(sender, connection, **kwargs):
+    """Receiver for Django's `connection_created` signal, which registers
+    the SQLite function used by the `in_network` lookup. """
+    if connection.vendor == "sqlite":
+        connection.connection.create_function("ip_in_network", 2,
+                _ip_in_network)
+
+
+
+@GenericIPAddressField.register_lookup
+class InNetwork(Lookup):
+    """Lookup for addresses contained in (or equal to) the passed network,
+    e.g. `source_ip__in_network="192.0.2.0/24"`. """
+    lookup_name = "in_network"
+
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return ("ip_in_network({0}, {1})".format(lhs, rhs),
+                lhs_params + rhs_params)
+
+
+    def as_postgresql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return ("{0} <<= {1}::inet".format(lhs, rhs),
+                lhs_params + rhs_params)
+
+
+    def as_mysql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        network = ipaddress.ip_network(unicode(self.rhs), strict=False)
+        return ("INET6_ATON({0}) BETWEEN INET6_ATON(%s) AND"
+                " INET6_ATON(%s)".format(lhs), lhs_params + [
+                unicode(network.network_address),
+                unicode(network.broadcast_address)])
@@ -0,0 +1,225 @@
+"""
+<Program Name>
+    retention.py
+
+<Author>
+    Lukas Puehringer <luk.puehringer@gmail.com>
+
+<Started>
+    October, 2026
+
+<Copyright>
+    See LICENSE for licensing information.
+
+<Purpose>
+    Bulk deletion and archiving of stored reports, used to expire reports
+    older than `settings.REPORT_RETENTION_MONTHS` (see
+    `website.management.commands.retention`) and to purge reports before a
+    given date (see `website.management.commands.purge`).
+
+    Deleting reports with Django's `QuerySet.delete` loads every related
+    record, authentication result, etc. into memory to cascade the deletion.
+    Instead, reports are deleted here in batches of at most BATCH_SIZE
+    reports, with one set-based DELETE statement per table, from the tables
+    referencing records up to the report table.
+
+    Reports can be archived before they are deleted, as newline delimited
+    JSON (NDJSON), i.e. one JSON object per line and report, with the
+    reporter, report errors and records, and the records' policy override
+    reasons and authentication results as nested objects (see
+    `report_to_dict`). Archives are re-imported with
+    `python manage.py restore`.
+
+"""
+import gzip
+import json
+
+from dateutil.relativedelta import relativedelta
+from django.db import connection, transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from website.models import (Report, ReportError, Record, PolicyOverrideReason,
+        AuthResultDKIM, AuthResultSPF, RecordFact, RecordRollup)
+
+# Maximum number of reports deleted at once (SQLite limits the number of
+# query parameters to 999)
+BATCH_SIZE = 500
+
+# Models referencing records and reports (except records) respectively
+RECORD_MODELS = (PolicyOverrideReason, AuthResultDKIM, AuthResultSPF,
+        RecordFact)
+REPORT_MODELS = (ReportError, RecordRollup)
+
+
+
+def get_cutoff(months, now=None):
+    """Return the first day of the month that is passed number of months
+    before the current (or passed) month, i.e. reports that begin before that
+    day are older than passed retention period. """
+    if now is None:
+        now = timezone.now()
+
+    return now.replace(day=1, hour=0, minute=0, second=0,
+            microsecond=0) - relativedelta(months=months)
+
+
+
+def iter_months(begin, end):
+    """Return iterator over the first days of the months from the month of
+    passed begin date up to (excluding) passed end date. """
+    month = begin.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    while month < end:
+        yield month
+        month += relativedelta(months=1)
+
+
+
+def delete_reports(reports, archive_file=None):
+    """Delete reports in passed report query set and their related objects
+    in batches of at most BATCH_SIZE reports, each in one transaction.
+    If an archive file object is passed, the reports of each batch are
+    written to it before they are deleted (see `archive_report_ids`).
+    Returns the number of deleted reports. Callers recompute the Overview
+    page statistics afterwards (see `Report.cacheOverviewSummaries`). """
+    report_cnt = 0
+    while True:
+        with transaction.atomic():
+            report_ids = list(reports.order_by("id").values_list("id",
+                    flat=True)[:BATCH_SIZE])
+            if not report_ids:
+                return report_cnt
+
+            if archive_file is not None:
+                archive_report_ids(report_ids, archive_file)
+
+            delete_report_ids(report_ids)
+
+        report_cnt += len(report_ids)
+
+
+
+def delete_report_ids(report_ids):
+    """Delete reports with passed ids (at most BATCH_SIZE) and their related
+    objects, using one DELETE statement per table. Must be called inside a
+    transaction. """
+    quote = connection.ops.quote_name
+    placeholders = ", ".join(["%s"] * len(report_ids))
+    record_ids_sql = "SELECT id FROM {0} WHERE report_id IN ({1})".format(
+            quote(Record._meta.db_table), placeholders)
+
+    with connection.cursor() as cursor:
+        for model in RECORD_MODELS:
+            cursor.execute("DELETE FROM {0} WHERE record_id IN ({1})".format(
+                    quote(model._meta.db_table), record_ids_sql), report_ids)
+
+        for model in REPORT_MODELS + (Record,):
+            cursor.execute("DELETE FROM {0} WHERE report_id IN ({1})".format(
+                    quote(model._meta.db_table), placeholders), report_ids)
+
+        cursor.execute("DELETE FROM {0} WHERE id IN ({1})".format(
+                quote(Report._meta.db_table), placeholders), report_ids)
+
+    Report.updateDataGeneration()
+
+
+
+def open_archive(path):
+    """Return new archive file object for writing (see `archive_report_ids`)
+    at passed path, which is gzip compressed if the path ends with ".gz". """
+    if path.endswith(".gz"):
+        return gzip.open(path, "wb")
+
+    return open(path, "wb")
+
+
+
+def archive_report_ids(report_ids, archive_file):
+    """Write reports with passed ids (at most BATCH_SIZE) and their related
+    objects to passed file object, one JSON object (see `report_to_dict`)
+    per line. The file is flushed, so that no report is deleted before it is
+    archived. """
+    reports = Report.objects.filter(id__in=report_ids).order_by("id"
+            ).select_related("reporter", "domain").prefetch_related(
+            "reporterror_set",
+            Prefetch("record_set", queryset=Record.objects.select_related(
+                    "envelope_to", "envelope_from", "header_from")),
+            "record_set__policyoverridereason_set",
+            Prefetch("record_set__authresultdkim_set",
+                    queryset=AuthResultDKIM.objects.select_related("domain")),
+            Prefetch("record_set__authresultspf_set",
+                    queryset=AuthResultSPF.objects.select_related("domain")))
+
+    for report in reports:
+        archive_file.write(json.dumps(report_to_dict(report),
+                sort_keys=True) + "\n")
+
+    archive_file.flush()
+
+
+
+def report_to_dict(report):
+    """Return JSON serializable dictionary of passed report and its related
+    objects, using the model field names, numeric values as stored and
+    domain names. """
+    return {
+        "report_type": report.report_type,
+        "report_hash": report.report_hash,
+        "report_id": report.report_id,
+        "date_range_begin": report.date_range_begin.isoformat(),
+        "date_range_end": report.date_range_end.isoformat(),
+        "version": (str(report.version)
+                if report.version is not None else None),
+        "reporter": {
+            "org_name": report.reporter.org_name,
+            "email": report.reporter.email,
+            "extra_contact_info": report.reporter.extra_contact_info
+        },
+        "domain": _domain_name(report.domain),
+        "adkim": report.adkim,
+        "aspf": report.aspf,
+        "p": report.p,
+        "sp": report.sp,
+        "pct": report.pct,
+        "fo": report.fo,
+        "errors": [error.error for error in report.reporterror_set.all()],
+        "records": [
+            {
+                "source_ip": record.source_ip,
+                "country_iso_code": record.country_iso_code,
+                "count": record.count,
+                "disposition": record.disposition,
+                "dkim": record.dkim,
+                "spf": record.spf,
+                "envelope_to": _domain_name(record.envelope_to),
+                "envelope_from": _domain_name(record.envelope_from),
+                "header_from": _domain_name(record.header_from),
+                "reasons": [
+                    {
+                        "reason_type": reason.reason_type,
+                        "reason_comment": reason.reason_comment
+                    } for reason in record.policyoverridereason_set.all()
+                ],
+                "auth_results_dkim": [
+                    {
+                        "domain": _domain_name(result.domain),
+                        "result": result.result,
+                        "human_result": result.human_result
+                    } for result in record.authresultdkim_set.all()
+                ],
+                "auth_results_spf": [
+                    {
+                        "domain": _domain_name(result.domain),
+                        "scope": result.scope,
+                        "result": result.result
+                    } for result in record.authresultspf_set.all()
+                ]
+            } for record in report.record_set.all()
+        ]
+    }
+
+
+
+def _domain_name(domain):
+    """Return name of passed domain or None. """
+    return domain.name if domain is not None else None
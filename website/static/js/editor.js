@@ -23,7 +23,7 @@ var editor = {
                     .closest("[data-formset-form]");
 
             // Copy plain input fields
-            ["filter_label", "filter_color", "filter_source_ip"].forEach(
+            ["filter_label", "filter_color"].forEach(
                 function(filter_class) {
                     var selector = "." + filter_class + " input";
                     $newForm.find(selector).val(
@@ -34,7 +34,7 @@ var editor = {
 
             // Copy select elements
             ["filter_report_receiver_domain", "filter_report_sender",
-                    "filter_raw_spf_domain", "filter_raw_spf_result",
+                    "filter_source_ip", "filter_raw_spf_domain", "filter_raw_spf_result",
                     "filter_raw_dkim_domain", "filter_raw_dkim_result",
                     "filter_aligned_spf_result", "filter_aligned_dkim_result",
                     "filter_disposition"].forEach(function(filter_class) {
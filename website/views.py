@@ -33,14 +33,19 @@ from django.contrib import messages
 from django.shortcuts import render, redirect
 from django.http import (HttpResponse,
         HttpResponseRedirect, StreamingHttpResponse)
+from django.core.cache import cache
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from django.views.decorators.cache import cache_page
+from django.db.models import Exists, OuterRef
 from django.views.decorators.csrf import ensure_csrf_cookie
 
 from website.forms import ViewForm, FilterSetFormSet
-from website.models import (View, DateRange, Report, Reporter, AuthResultDKIM,
-        AuthResultSPF, OrderedModel, _clone)
-from website import choices
+from website.models import (View, DateRange, Domain, Report, Reporter,
+        AuthResultDKIM, AuthResultSPF, RecordFact, OrderedModel, _clone,
+        DATA_CACHE_TIMEOUT)
+from website import choices, networks
+
+# Maximum number of distinct source IPs returned as choices
+SOURCE_IP_CHOICES_MAX = 1000
 
 
 def overview(request):
@@ -58,15 +63,14 @@ def overview(request):
 
 
 
-@cache_page(60 * 60 * 24)
 def overview_async(request):
     """Return JSON formatted statistics about DMARC aggregate report data per
-    report type, i.e. incoming or outgoing, for `Overview` page. Aggregate
-    reports are usually sent and received on a daily basis, so it should be
-    save to cache the statistics for a day, using the `@cache_page` decorator.
+    report type, i.e. incoming or outgoing, for `Overview` page. The
+    statistics are cached until reports are stored or deleted, see
+    `Report.getCachedOverviewSummary`.
     """
     report_type = int(request.GET.get("report_type"))
-    response = Report.getOverviewSummary(report_type)
+    response = Report.getCachedOverviewSummary(report_type)
 
     return HttpResponse(json.dumps(response), content_type="application/json")
 
@@ -168,51 +172,100 @@ def choices_async(request):
     """Return JSON data for HTML multiselect elements that load their options
     dynamically (on type) using the passed (as GET parameter) query string.
     """
-    report_type = request.GET.get("report_type")
-    choice_type = request.GET.get("choice_type")
-    query_str = request.GET.get("query_str")
+    values = list(get_choices(request.GET.get("choice_type"),
+            request.GET.get("report_type"), request.GET.get("query_str")))
+
+    # Suggest the networks that contain the source IPs before the source IPs
+    if request.GET.get("choice_type") == "source_ip":
+        values = networks.aggregate(values) + values
+
+    return HttpResponse(json.dumps({"choices": values}),
+            content_type="application/json")
+
 
+def get_choices(choice_type, report_type, query_str):
+    """Return query set of distinct reporters, reportees, DKIM or SPF domains
+    (depending on passed choice type) of reports of passed type, that contain
+    passed query string, or of distinct source IPs that start with or, if it
+    is a network in CIDR notation, are in passed query string. Used by
+    `choices_async`. """
+    # Reporters are checked for reports of passed type with a semi-join
+    # (instead of joining all their reports), only reporters that share an
+    # organization name are merged
     if choice_type == "reporter":
         values = Reporter.objects.filter(
-                    report__report_type=report_type
-                ).filter(
                     email__icontains=query_str
-                ).distinct().order_by(
+                ).annotate(
+                    used=Exists(Report.objects.filter(
+                            report_type=report_type, reporter=OuterRef("pk")))
+                ).filter(
+                    used=True
+                ).order_by(
                     "org_name"
-                ).values_list("org_name")
+                ).values_list("org_name").distinct()
 
+    # Domains are searched by name in the (small) domain dictionary and
+    # then checked for use in reports of passed type by domain id
     elif choice_type == "reportee":
-        values = Report.objects.filter(
-                    report_type=report_type
+        values = Domain.objects.filter(
+                    name__contains=query_str
+                ).annotate(
+                    used=Exists(Report.objects.filter(
+                            report_type=report_type, domain=OuterRef("pk")))
                 ).filter(
-                    domain__contains=query_str
-                ).distinct().order_by(
-                    "domain"
-                ).values_list("domain", flat=True)
+                    used=True
+                ).order_by(
+                    "name"
+                ).values_list("name", flat=True)
 
     elif choice_type == "dkim_domain":
-        values = AuthResultDKIM.objects.filter(
-                    record__report__report_type=report_type
+        values = Domain.objects.filter(
+                    name__contains=query_str
+                ).annotate(
+                    used=Exists(AuthResultDKIM.objects.filter(
+                            record__report__report_type=report_type,
+                            domain=OuterRef("pk")))
                 ).filter(
-                    domain__contains=query_str
-                ).distinct().order_by(
-                    "domain"
-                ).values_list("domain")
+                    used=True
+                ).order_by(
+                    "name"
+                ).values_list("name")
 
     elif choice_type == "spf_domain":
-        values = AuthResultSPF.objects.filter(
-                    record__report__report_type=report_type
+        values = Domain.objects.filter(
+                    name__contains=query_str
+                ).annotate(
+                    used=Exists(AuthResultSPF.objects.filter(
+                            record__report__report_type=report_type,
+                            domain=OuterRef("pk")))
+                ).filter(
+                    used=True
+                ).order_by(
+                    "name"
+                ).values_list("name")
+
+    elif choice_type == "source_ip":
+        try:
+            ip_filter = {"source_ip__in_network": networks.normalize(
+                    query_str)}
+
+        except ValueError:
+            ip_filter = {"source_ip__startswith": query_str}
+
+        values = RecordFact.objects.filter(
+                    report_type=report_type
                 ).filter(
-                    domain__contains=query_str
-                ).distinct().order_by(
-                    "domain"
-                ).values_list("domain")
+                    **ip_filter
+                ).order_by(
+                    "source_ip"
+                ).values_list(
+                    "source_ip", flat=True
+                ).distinct()[:SOURCE_IP_CHOICES_MAX]
 
     else:
         values = []
 
-    return HttpResponse(json.dumps({"choices": list(values)}),
-            content_type="application/json")
+    return values
 
 
 def delete(request, view_id):
@@ -365,12 +418,29 @@ def deep_analysis(request, view_id):
         })
 
 
+def get_cached(key, get_value):
+    """Return value cached with passed key, or get value with passed function
+    and cache it, if it is not cached yet. Keys of analysis view data contain
+    the view revision and data generation (see `View.getDataCacheKey`), i.e.
+    they don't have to be deleted explicitly. """
+    value = cache.get(key)
+
+    if value is None:
+        value = get_value()
+        cache.set(key, value, DATA_CACHE_TIMEOUT)
+
+    return value
+
+
 def map_async(request, view_id):
     """Return JSON formatted DMARC aggregate report data prepared for the
     passed view's (by id) map as displayed on the `Deep Analysis` page.
     """
     view = View.objects.get(pk=view_id)
-    view_type_map_data = view.getMapData() if view.type_map else []
+    view_type_map_data = []
+    if view.type_map:
+        view_type_map_data = get_cached(view.getDataCacheKey("map"),
+                view.getMapData)
 
     return HttpResponse(json.dumps(view_type_map_data),
             content_type="application/json")
@@ -381,7 +451,10 @@ def line_async(request, view_id):
     passed view's (by id) line chart as displayed on the `Deep Analysis` page.
     """
     view = View.objects.get(pk=view_id)
-    view_type_line_data = view.getLineData() if view.type_line else []
+    view_type_line_data = []
+    if view.type_line:
+        view_type_line_data = get_cached(view.getDataCacheKey("line"),
+                view.getLineData)
 
     return HttpResponse(json.dumps(view_type_line_data),
             content_type="application/json")
@@ -407,9 +480,34 @@ def table_async(request, view_id):
     row_index = int(request_data.get("start", 0))
     time_filter = request_data.get("custom_filters").get("time")
 
+    # NOTE: Beware of multicolumn sort!!
+    order = request_data.get("order")[0]
+    columns = request_data.get("columns")
+    order_idx = int(order["column"])
+    order_dir = order["dir"] if columns[order_idx]["orderable"] else None
+
+    resp = get_cached(view.getDataCacheKey("table", page_length, row_index,
+            time_filter, order_idx, order_dir), lambda: get_table_page(view,
+            page_length, row_index, time_filter, order_idx, order_dir))
+
+    # The draw counter is specific to the request
+    resp["draw"] = draw_counter
+
+    return HttpResponse(json.dumps(resp), content_type="application/json")
+
+
+def get_table_page(view, page_length, row_index, time_filter, order_idx,
+        order_dir):
+    """Return dictionary with total and filtered record count and the table
+    rows of passed view, for the page of passed length that contains the row
+    with passed index, optionally filtered by passed time range (list of
+    begin and end timestamp strings) and ordered by the column with passed
+    index in passed direction ("asc" or "desc", or None to not order). Used
+    by `table_async`. """
     # Get all (unfiltered) records for this view from the db
     records = view.getTableRecords()
-    records_total = records.count()
+    records_total = get_cached(view.getDataCacheKey("table_total"),
+            records.count)
     records_filtered = records_total
 
     # Filter table rows based on time, using an on-the-fly `DateRange` filter
@@ -430,15 +528,10 @@ def table_async(request, view_id):
             pass
 
     # Order
-    # NOTE: Beware of multicolumn sort!!
-    order = request_data.get("order")[0]
-    columns = request_data.get("columns")
-    order_idx = int(order["column"])
-
-    if columns[order_idx]["orderable"]:
+    if order_dir is not None:
         order_by = View.getTableOrderFields()
 
-        prefix = "-" if order["dir"] == "desc" else ""
+        prefix = "-" if order_dir == "desc" else ""
         records = records.order_by(prefix + order_by[order_idx])
 
     # Paginate
@@ -458,15 +551,12 @@ def table_async(request, view_id):
     # Get table data for the filtered and paginated records only
     page_data = view.getTableData(data)
 
-    resp = {
-        "draw": draw_counter,
+    return {
         "recordsTotal": records_total,
         "recordsFiltered": records_filtered,
         "data": page_data
     }
 
-    return HttpResponse(json.dumps(resp), content_type="application/json")
-
 
 def help_page(request):
     """Render static "Help" page. """
@@ -24,11 +24,13 @@ from django.utils.safestring import mark_safe
 class MultiSelectWidget(SelectMultiple):
     """Multi Select Widget using Selectize.js. If `load` is passed, selectize
     receives extra options to load select options dynamically from the
-    passed `action` url. """
+    passed `action` url. If `create` is true, the user may also add options
+    that were not loaded. """
 
     def __init__(self, *args, **kwargs):
         self.load = kwargs.pop("load")
         self.action = kwargs.pop("action")
+        self.create = kwargs.pop("create", False)
         super(MultiSelectWidget, self).__init__(*args, **kwargs)
 
     def render(self, name, value, attrs=None, renderer=None):
@@ -50,13 +52,16 @@ class MultiSelectWidget(SelectMultiple):
                             options.load_action = "%(action)s";
                             options.load_choice_type = "%(load)s";
                             }
+                        if (%(create)r){
+                            options.create = true;
+                            }
                         // Also gets called when the widget is cloned
                         $(document).ready(function(){
                             $('#id_%(name)s').selectize(options);
                         });
                     })('django' in window && django.jQuery ? django.jQuery: jQuery);
                 </script>''' % {'load' : self.load, 'name': name,
-                        'action': self.action}
+                        'action': self.action, 'create': int(self.create)}
 
         return  mark_safe("%s %s" % (html, js))
 